@@ -0,0 +1,102 @@
+"""
+Analytics API routes (outliers and spending trends)
+"""
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.db.session import get_db, get_read_db
+from app.core.auth import get_current_user
+from app.models.models import Transaction, TransactionStatus
+from app.services.changes import record_change
+
+router = APIRouter()
+
+
+@router.get("/anomalies")
+async def list_anomalies(
+    z_threshold: float = Query(3.0, gt=0, description="Minimum |z-score| to report"),
+    limit: int = Query(100, ge=1, le=1000),
+    user: dict = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Transactions whose amount is unusual for their merchant (or category)
+    """
+    # numpy/pandas are imported on first use to keep API startup fast
+    from app.services.analytics import ledger_cache, find_outliers
+    
+    frame = ledger_cache.get(db, user["user_id"])
+    outliers = find_outliers(frame, z_threshold=z_threshold).head(limit)
+
+    return {
+        "z_threshold": z_threshold,
+        "anomalies": [
+            {
+                "transaction_id": row.id,
+                "date": row.date.date(),
+                "amount": row.amount,
+                "merchant": row.merchant,
+                "group": row.group,
+                "group_mean": round(row.group_mean, 2),
+                "z_score": round(row.z_score, 2),
+                "status": row.status
+            }
+            for row in outliers.itertuples()
+        ]
+    }
+
+
+@router.post("/anomalies/flag")
+async def flag_anomalies(
+    z_threshold: float = Query(3.0, gt=0),
+    user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Mark pending outlier transactions as FLAGGED for review
+    """
+    from app.services.analytics import ledger_cache, find_outliers, pending_outlier_ids
+    
+    frame = ledger_cache.get(db, user["user_id"])
+    ids = pending_outlier_ids(find_outliers(frame, z_threshold=z_threshold))
+    if not ids:
+        return {"flagged": 0}
+
+    # One set-based UPDATE; the status guard skips rows reviewed meanwhile,
+    # and only the rows it actually changed get a change event
+    flagged = db.execute(
+        update(Transaction)
+        .where(
+            Transaction.organization_id == user["user_id"],
+            Transaction.id.in_(ids),
+            Transaction.status == TransactionStatus.PENDING
+        )
+        .values(status=TransactionStatus.FLAGGED, version=Transaction.version + 1)
+        .returning(Transaction.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    for transaction_id in flagged:
+        record_change(db, user["user_id"], "transaction", transaction_id, "updated")
+    db.commit()
+
+    return {"flagged": len(flagged)}
+
+
+@router.get("/trends")
+async def get_spending_trends(
+    group_by: str = Query("category", pattern="^(category|merchant)$"),
+    months: int = Query(12, ge=1, le=120),
+    user: dict = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Monthly totals with rolling mean and month-over-month change
+    per category or merchant
+    """
+    from app.services.analytics import ledger_cache, spending_trends
+    
+    frame = ledger_cache.get(db, user["user_id"])
+    return {
+        "group_by": group_by,
+        **spending_trends(frame, group_by=group_by, months=months)
+    }
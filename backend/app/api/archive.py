@@ -0,0 +1,92 @@
+"""
+Archive API routes (closed fiscal periods in columnar storage)
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from app.db.session import get_db, get_read_db
+from app.core.auth import get_current_user
+from app.models.models import TransactionArchive
+from app.services.archive import archive_period, restore_archive
+from datetime import date
+from uuid import UUID
+
+router = APIRouter()
+
+
+class ArchiveRequest(BaseModel):
+    period_start: date
+    period_end: date
+
+
+def serialize_archive(archive: TransactionArchive) -> dict:
+    return {
+        "id": archive.id,
+        "period_start": archive.period_start,
+        "period_end": archive.period_end,
+        "min_date": archive.min_date,
+        "max_date": archive.max_date,
+        "row_count": archive.row_count,
+        "total_amount": archive.total_amount,
+        "size_bytes": archive.size_bytes,
+        "created_at": archive.created_at
+    }
+
+
+@router.get("/")
+async def list_archives(
+    user: dict = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    List archived periods
+    """
+    archives = db.query(TransactionArchive).filter(
+        TransactionArchive.organization_id == user["user_id"]
+    ).order_by(TransactionArchive.period_start).all()
+    
+    return {"archives": [serialize_archive(archive) for archive in archives]}
+
+
+@router.post("/")
+async def create_archive(
+    request: ArchiveRequest,
+    user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Move a closed period's transactions out of the live table into an archive
+    file; reports keep including them
+    """
+    try:
+        archive = archive_period(db, user["user_id"], request.period_start, request.period_end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return serialize_archive(archive)
+
+
+@router.delete("/{archive_id}")
+async def restore_archived_period(
+    archive_id: UUID,
+    user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Move an archive's transactions back into the live table (reopen a period)
+    """
+    archive = db.query(TransactionArchive).filter(
+        TransactionArchive.id == archive_id,
+        TransactionArchive.organization_id == user["user_id"]
+    ).first()
+    
+    if not archive:
+        raise HTTPException(status_code=404, detail="Archive not found")
+    
+    try:
+        restored = restore_archive(db, archive)
+    except ValueError as e:
+        # The file no longer matches what was archived; keep it for inspection
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return {"restored": restored}
@@ -0,0 +1,96 @@
+"""
+Change feed API routes
+"""
+import asyncio
+import json
+from fastapi import APIRouter, Depends, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.db.session import get_db, SessionLocal
+from app.core.auth import get_current_user
+from app.core.config import settings
+from app.services.changes import (
+    notifier,
+    serialize_change,
+    get_changes_since,
+    get_latest_change_id,
+)
+from typing import Optional
+
+router = APIRouter()
+
+
+@router.get("/")
+async def list_changes(
+    since: int = Query(0, ge=0, description="Return changes after this change id"),
+    limit: int = Query(500, ge=1, le=5000),
+    user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Fetch changes (inserted/updated/deleted transactions, document status
+    changes) after a given change id
+    """
+    changes = get_changes_since(db, user["user_id"], since, limit)
+    return {
+        "changes": [serialize_change(change) for change in changes],
+        "last_id": changes[-1].seq if changes else since
+    }
+
+
+def _fetch_changes(organization_id, since_id: Optional[int]):
+    """Load pending changes with a short-lived session (streams are long-lived)"""
+    db = SessionLocal()
+    try:
+        if since_id is None:
+            return [], get_latest_change_id(db, organization_id)
+        changes = get_changes_since(db, organization_id, since_id, settings.CHANGE_FEED_BATCH_SIZE)
+        return [serialize_change(change) for change in changes], since_id
+    finally:
+        db.close()
+
+
+@router.get("/stream")
+async def stream_changes(
+    request: Request,
+    since: Optional[int] = Query(None, ge=0, description="Resume after this change id"),
+    last_event_id: Optional[str] = Header(None),
+    user: dict = Depends(get_current_user)
+):
+    """
+    Server-sent events stream of changes for the current organization
+    Each event id is the change id; reconnecting clients resume via
+    Last-Event-ID. Without since/Last-Event-ID only new changes are sent.
+    """
+    organization_id = user["user_id"]
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+
+    async def events():
+        cursor = since
+        wake = notifier.subscribe(organization_id)
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                wake.clear()
+                changes, cursor = await run_in_threadpool(_fetch_changes, organization_id, cursor)
+                for change in changes:
+                    cursor = change["id"]
+                    yield f"id: {change['id']}\nevent: {change['entity']}\ndata: {json.dumps(change)}\n\n"
+                if len(changes) >= settings.CHANGE_FEED_BATCH_SIZE:
+                    continue  # more backlog to drain
+
+                try:
+                    await asyncio.wait_for(wake.wait(), timeout=settings.CHANGE_FEED_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    # Keep proxies from closing an idle connection
+                    yield ": heartbeat\n\n"
+        finally:
+            notifier.unsubscribe(organization_id, wake)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
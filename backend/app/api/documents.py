@@ -1,15 +1,21 @@
 """
 Documents API routes
 """
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File
+from sqlalchemy import update
 from sqlalchemy.orm import Session
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 from app.core.auth import get_current_user
-from app.models.models import Document, DocumentStatus
+from app.core.ratelimit import admission_control
+from app.models.models import Document, DocumentStatus, Transaction
+from app.services.changes import record_change
+from app.services.ingest import claim_document, process_document_rows
+from app.services.storage import storage
 from pydantic import BaseModel
 from typing import List, Optional
-from uuid import UUID
+from uuid import UUID, uuid4
 from datetime import datetime
+import os
 
 router = APIRouter()
 
@@ -23,12 +29,20 @@ class DocumentResponse(BaseModel):
     uploaded_at: datetime
     processed_at: Optional[datetime]
     error_message: Optional[str]
+    rows_imported: int
+    rows_skipped: int
+    checkpoint_offset: int
     
     class Config:
         from_attributes = True
 
 
-@router.post("/upload", response_model=DocumentResponse, status_code=201)
+@router.post(
+    "/upload",
+    response_model=DocumentResponse,
+    status_code=201,
+    dependencies=[Depends(admission_control("uploads"))]
+)
 async def upload_document(
     file: UploadFile = File(...),
     user: dict = Depends(get_current_user),
@@ -55,12 +69,14 @@ async def upload_document(
     content = await file.read()
     file_size = len(content)
     
-    # TODO: Upload to S3 or Supabase Storage
-    # For now, we'll just store metadata
-    storage_path = f"uploads/{user['user_id']}/{file.filename}"
+    # Keep the original so processing can be retried/resumed
+    document_id = uuid4()
+    storage_path = f"uploads/{user['user_id']}/{document_id}/{os.path.basename(file.filename)}"
+    storage.write_bytes(storage_path, content)
     
     # Create document record
     db_document = Document(
+        id=document_id,
         organization_id=user["user_id"],
         filename=file.filename,
         file_type=file.content_type,
@@ -70,6 +86,8 @@ async def upload_document(
     )
     
     db.add(db_document)
+    db.flush()
+    record_change(db, user["user_id"], "document", db_document.id, "inserted", DocumentStatus.PENDING.value)
     db.commit()
     db.refresh(db_document)
     
@@ -81,7 +99,7 @@ async def list_documents(
     skip: int = 0,
     limit: int = 100,
     user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     List all uploaded documents
@@ -113,14 +131,16 @@ async def get_document(
     return document
 
 
-@router.post("/{document_id}/process")
+@router.post("/{document_id}/process", dependencies=[Depends(admission_control("uploads"))])
 async def process_document(
     document_id: UUID,
+    background_tasks: BackgroundTasks,
     user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Process a document to extract transactions
+    Failed or stalled documents resume from their last checkpoint
     """
     document = db.query(Document).filter(
         Document.id == document_id,
@@ -130,24 +150,24 @@ async def process_document(
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    if document.status != DocumentStatus.PENDING:
+    attempt = claim_document(db, user["user_id"], document_id)
+    if attempt is None:
         raise HTTPException(
             status_code=400,
-            detail=f"Document already processed (status: {document.status})"
+            detail=f"Document already processed or processing (status: {document.status})"
         )
     
-    # Update status to processing
-    document.status = DocumentStatus.PROCESSING
+    record_change(db, user["user_id"], "document", document.id, "status_changed", DocumentStatus.PROCESSING.value)
     db.commit()
     
-    # TODO: Implement actual document processing
-    # This will be in a background task/service
-    # For now, return a message
+    # Runs after the response is sent; commits every DOCUMENT_BATCH_SIZE rows
+    background_tasks.add_task(process_document_rows, document_id, attempt)
     
     return {
         "message": "Document processing started",
         "document_id": document_id,
-        "status": "processing"
+        "status": "processing",
+        "resume_from": document.checkpoint_offset
     }
 
 
@@ -158,7 +178,8 @@ async def delete_document(
     db: Session = Depends(get_db)
 ):
     """
-    Delete a document
+    Delete a document; the transactions imported from it are kept
+    (reviewed, tagged and paired rows stay as they are)
     """
     document = db.query(Document).filter(
         Document.id == document_id,
@@ -168,9 +189,25 @@ async def delete_document(
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    # TODO: Delete from S3/Supabase Storage
+    # One bulk UPDATE unlinks the rows; the ids go to the change feed
+    unlinked_ids = db.execute(
+        update(Transaction)
+        .where(
+            Transaction.source_document_id == document.id,
+            Transaction.organization_id == user["user_id"]
+        )
+        .values(source_document_id=None, version=Transaction.version + 1)
+        .returning(Transaction.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    for transaction_id in unlinked_ids:
+        record_change(db, user["user_id"], "transaction", transaction_id, "updated")
     
     db.delete(document)
+    record_change(db, user["user_id"], "document", document.id, "deleted")
     db.commit()
     
+    if document.storage_path:
+        storage.discard(document.storage_path)
+    
     return {"message": "Document deleted successfully"}
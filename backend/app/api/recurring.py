@@ -0,0 +1,55 @@
+"""
+Recurring transactions API routes
+"""
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from app.db.session import get_db, get_read_db
+from app.core.auth import get_current_user
+from app.models.models import RecurringSeries
+from app.services.recurring import rebuild_recurring_series, is_active
+from datetime import date
+
+router = APIRouter()
+
+
+def serialize_series(series: RecurringSeries, today: date) -> dict:
+    return {
+        "id": series.id,
+        "merchant": series.merchant,
+        "direction": series.direction,
+        "cadence": series.cadence,
+        "typical_amount": series.typical_amount,
+        "occurrence_count": series.occurrence_count,
+        "first_date": series.first_date,
+        "last_date": series.last_date,
+        "next_expected_date": series.next_expected_date,
+        "is_active": is_active(series, today)
+    }
+
+
+@router.get("/")
+async def list_recurring_series(
+    user: dict = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    List detected recurring series (subscriptions, rent, payroll, ...)
+    """
+    today = date.today()
+    series = db.query(RecurringSeries).filter(
+        RecurringSeries.organization_id == user["user_id"]
+    ).order_by(RecurringSeries.next_expected_date).all()
+    return [serialize_series(s, today) for s in series]
+
+
+@router.post("/rebuild")
+async def rebuild_recurring(
+    user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Re-detect all recurring series from the organization's full history
+    """
+    series = rebuild_recurring_series(db, user["user_id"])
+    db.commit()
+    return {"series_detected": len(series)}
@@ -1,23 +1,123 @@
 """
 Reports API routes
 """
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from app.db.session import get_db
+from app.db.session import get_read_db
 from app.core.auth import get_current_user
-from app.models.models import Transaction, Category
-from typing import Optional
-from datetime import date
+from app.core.ratelimit import admission_control
+from app.models.models import Transaction, Category, Tag, RecurringSeries, transaction_tags
+from app.services.recurring import project_occurrences, is_active
+from app.services.archive import scan_archives
+from typing import Optional, List, Dict, Tuple
+from datetime import date, datetime, timedelta
+from dateutil.relativedelta import relativedelta
+from uuid import UUID
 
 router = APIRouter()
 
+GRANULARITY_STEP = {
+    "month": relativedelta(months=1),
+    "quarter": relativedelta(months=3),
+}
 
-@router.get("/income-statement")
+
+def _bucket_start(day: date, granularity: str) -> date:
+    """First day of the month/quarter containing day"""
+    month = day.month if granularity == "month" else (day.month - 1) // 3 * 3 + 1
+    return date(day.year, month, 1)
+
+
+def _bucket_label(start: date, granularity: str) -> str:
+    if granularity == "quarter":
+        return f"{start.year}-Q{(start.month - 1) // 3 + 1}"
+    return start.strftime("%Y-%m")
+
+
+def _bucket_expression(db: Session, granularity: str):
+    """
+    SQL expression bucketing Transaction.date
+    SQLite has no date_trunc; it buckets by month and quarters are folded
+    in Python (sums are additive)
+    """
+    from sqlalchemy import func
+    
+    if db.bind.dialect.name == "postgresql":
+        return func.date_trunc(granularity, Transaction.date)
+    return func.strftime("%Y-%m-01", Transaction.date)
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _bucketed_totals(
+    db: Session,
+    organization_id,
+    granularity: str,
+    ranges: List[Tuple[date, date]]
+) -> Dict[Tuple[date, Optional[UUID]], Dict[str, float]]:
+    """
+    Revenue/expense totals per (bucket start, category) for one or more date
+    ranges, in a single grouped query
+    """
+    from sqlalchemy import func, case, or_, and_
+    
+    bucket = _bucket_expression(db, granularity).label("bucket")
+    revenue = func.sum(case((Transaction.amount > 0, Transaction.amount), else_=0))
+    expenses = func.sum(case((Transaction.amount < 0, -Transaction.amount), else_=0))
+    
+    rows = db.query(
+        bucket,
+        Transaction.category_id,
+        revenue,
+        expenses,
+        func.count(Transaction.id)
+    ).filter(
+        Transaction.organization_id == organization_id,
+        Transaction.is_transfer == False,  # Exclude internal transfers
+        or_(*[and_(Transaction.date >= start, Transaction.date <= end) for start, end in ranges])
+    ).group_by(bucket, Transaction.category_id).all()
+    
+    totals: Dict[Tuple[date, Optional[UUID]], Dict[str, float]] = {}
+    for bucket_value, category_id, bucket_revenue, bucket_expenses, count in rows:
+        key = (_bucket_start(_as_date(bucket_value), granularity), category_id)
+        cell = totals.setdefault(key, {"revenue": 0.0, "expenses": 0.0, "count": 0})
+        cell["revenue"] += float(bucket_revenue or 0)
+        cell["expenses"] += float(bucket_expenses or 0)
+        cell["count"] += count
+    
+    # Closed periods moved to the archive tier
+    archived = scan_archives(db, organization_id, ranges, ["date", "amount", "category_id", "is_transfer"])
+    if archived is not None:
+        archived = archived[~archived["is_transfer"]]
+        archived = archived.assign(
+            bucket=archived["date"].map(lambda day: _bucket_start(day, granularity)),
+            revenue=archived["amount"].clip(lower=0),
+            expenses=(-archived["amount"]).clip(lower=0)
+        )
+        grouped = archived.groupby(["bucket", "category_id"], dropna=False).agg(
+            revenue=("revenue", "sum"), expenses=("expenses", "sum"), count=("amount", "size")
+        )
+        for (bucket_start, category_id), row in grouped.iterrows():
+            category_id = UUID(category_id) if isinstance(category_id, str) else None
+            cell = totals.setdefault((bucket_start, category_id), {"revenue": 0.0, "expenses": 0.0, "count": 0})
+            cell["revenue"] += float(row["revenue"])
+            cell["expenses"] += float(row["expenses"])
+            cell["count"] += int(row["count"])
+    return totals
+
+
+@router.get("/income-statement", dependencies=[Depends(admission_control("reports"))])
 async def get_income_statement(
     start_date: date = Query(..., description="Start date for the report"),
     end_date: date = Query(..., description="End date for the report"),
     user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Generate income statement (P&L) for a date range
@@ -36,6 +136,14 @@ async def get_income_statement(
     # TODO: Implement proper categorization with revenue vs expense
     total_revenue = sum(t.amount for t in transactions if t.amount > 0)
     total_expenses = sum(abs(t.amount) for t in transactions if t.amount < 0)
+    transaction_count = len(transactions)
+    
+    archived = scan_archives(db, user["user_id"], [(start_date, end_date)], ["amount", "is_transfer"])
+    if archived is not None:
+        amounts = archived.loc[~archived["is_transfer"], "amount"]
+        total_revenue += float(amounts[amounts > 0].sum())
+        total_expenses += float(-amounts[amounts < 0].sum())
+        transaction_count += len(amounts)
     net_income = total_revenue - total_expenses
     
     return {
@@ -53,7 +161,161 @@ async def get_income_statement(
             "categories": []  # TODO: Break down by category
         },
         "net_income": net_income,
-        "transaction_count": len(transactions)
+        "transaction_count": transaction_count
+    }
+
+
+@router.get("/comparative", dependencies=[Depends(admission_control("reports"))])
+async def get_comparative_income_statement(
+    start_date: Optional[date] = Query(None, description="Start date (defaults to trailing_months back from end_date)"),
+    end_date: Optional[date] = Query(None, description="End date (defaults to today)"),
+    granularity: str = Query("month", pattern="^(month|quarter)$"),
+    trailing_months: int = Query(12, ge=1, le=60, description="Window size when start_date is omitted"),
+    compare_prior_year: bool = Query(False, description="Add year-over-year columns"),
+    user: dict = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Income statement for every month/quarter in a range, as a dense
+    period x category matrix, computed in one grouped query
+    (optionally with prior-year comparison columns)
+    """
+    end_date = end_date or date.today()
+    if start_date is None:
+        start_date = _bucket_start(end_date, "month") - relativedelta(months=trailing_months - 1)
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must be on or before end_date")
+    
+    step = GRANULARITY_STEP[granularity]
+    buckets = []
+    current = _bucket_start(start_date, granularity)
+    while current <= end_date:
+        buckets.append(current)
+        current = current + step
+    if len(buckets) > 120:
+        raise HTTPException(status_code=400, detail="Too many periods; narrow the range or use quarters")
+    
+    prior_shift = relativedelta(years=1)
+    ranges = [(start_date, end_date)]
+    if compare_prior_year:
+        ranges.append((start_date - prior_shift, end_date - prior_shift))
+    totals = _bucketed_totals(db, user["user_id"], granularity, ranges)
+    
+    category_ids = sorted({category_id for _, category_id in totals if category_id}, key=str)
+    names = {}
+    if category_ids:
+        names = {
+            category.id: category
+            for category in db.query(Category).filter(Category.id.in_(category_ids))
+        }
+    
+    def matrix(kind: str, shift: relativedelta = relativedelta()):
+        rows = []
+        for category_id in category_ids + [None]:
+            values = [
+                totals.get((bucket - shift, category_id), {}).get(kind, 0.0)
+                for bucket in buckets
+            ]
+            if any(values):
+                category = names.get(category_id)
+                rows.append({
+                    "category_id": str(category_id) if category_id else None,
+                    "name": category.name if category else "Uncategorized",
+                    "values": values
+                })
+        column_totals = [sum(row["values"][i] for row in rows) for i in range(len(buckets))]
+        return {"totals": column_totals, "categories": rows}
+    
+    revenue = matrix("revenue")
+    expenses = matrix("expenses")
+    net_income = [r - e for r, e in zip(revenue["totals"], expenses["totals"])]
+    
+    report = {
+        "report_type": "comparative_income_statement",
+        "granularity": granularity,
+        "period": {
+            "start_date": start_date,
+            "end_date": end_date
+        },
+        "periods": [_bucket_label(bucket, granularity) for bucket in buckets],
+        "revenue": revenue,
+        "expenses": expenses,
+        "net_income": net_income,
+        "transaction_count": [
+            sum(cell["count"] for (b, _), cell in totals.items() if b == bucket)
+            for bucket in buckets
+        ]
+    }
+    
+    if compare_prior_year:
+        prior_revenue = matrix("revenue", prior_shift)
+        prior_expenses = matrix("expenses", prior_shift)
+        prior_net = [r - e for r, e in zip(prior_revenue["totals"], prior_expenses["totals"])]
+        report["prior_year"] = {
+            "periods": [_bucket_label(bucket - prior_shift, granularity) for bucket in buckets],
+            "revenue": prior_revenue,
+            "expenses": prior_expenses,
+            "net_income": prior_net
+        }
+        report["yoy_change"] = {
+            "revenue": [c - p for c, p in zip(revenue["totals"], prior_revenue["totals"])],
+            "expenses": [c - p for c, p in zip(expenses["totals"], prior_expenses["totals"])],
+            "net_income": [c - p for c, p in zip(net_income, prior_net)]
+        }
+    
+    return report
+
+
+@router.get("/spending-by-tag", dependencies=[Depends(admission_control("reports"))])
+async def get_spending_by_tag(
+    start_date: date = Query(..., description="Start date for the report"),
+    end_date: date = Query(..., description="End date for the report"),
+    user: dict = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Spending totals per tag for a date range
+    A transaction with several tags counts toward each of them
+    """
+    from sqlalchemy import func
+    
+    spent = func.sum(-Transaction.amount).label("total")
+    rows = db.query(
+        Tag.name,
+        spent,
+        func.count(Transaction.id)
+    ).join(
+        transaction_tags, transaction_tags.c.tag_id == Tag.id
+    ).join(
+        Transaction, Transaction.id == transaction_tags.c.transaction_id
+    ).filter(
+        Tag.organization_id == user["user_id"],
+        Transaction.organization_id == user["user_id"],
+        Transaction.date >= start_date,
+        Transaction.date <= end_date,
+        Transaction.amount < 0,
+        Transaction.is_transfer == False  # Exclude internal transfers
+    ).group_by(Tag.name).all()
+    totals = {name: [float(total or 0), count] for name, total, count in rows}
+    
+    archived = scan_archives(db, user["user_id"], [(start_date, end_date)], ["amount", "is_transfer", "tags"])
+    if archived is not None:
+        spending = archived[~archived["is_transfer"] & (archived["amount"] < 0)].explode("tags").dropna(subset=["tags"])
+        for name, group in spending.groupby("tags")["amount"]:
+            cell = totals.setdefault(name, [0.0, 0])
+            cell[0] += float(-group.sum())
+            cell[1] += len(group)
+    
+    return {
+        "report_type": "spending_by_tag",
+        "period": {
+            "start_date": start_date,
+            "end_date": end_date
+        },
+        "tags": [
+            {"tag": name, "total": total, "transaction_count": count}
+            for name, (total, count) in sorted(totals.items(), key=lambda item: -item[1][0])
+        ]
     }
 
 
@@ -61,7 +323,7 @@ async def get_income_statement(
 async def get_balance_sheet(
     as_of_date: date = Query(..., description="Balance sheet as of this date"),
     user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Generate balance sheet as of a specific date
@@ -92,7 +354,7 @@ async def get_cash_flow(
     start_date: date = Query(...),
     end_date: date = Query(...),
     user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Generate cash flow statement
@@ -109,3 +371,60 @@ async def get_cash_flow(
         "financing_activities": {},
         "message": "Cash flow statement generation coming soon"
     }
+
+
+@router.get("/cash-flow-forecast", dependencies=[Depends(admission_control("reports"))])
+async def get_cash_flow_forecast(
+    days: int = Query(90, ge=1, le=730, description="Forecast horizon in days"),
+    user: dict = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Project upcoming cash flow from detected recurring series
+    """
+    today = date.today()
+    end_date = today + timedelta(days=days)
+    series_list = db.query(RecurringSeries).filter(
+        RecurringSeries.organization_id == user["user_id"]
+    ).all()
+    
+    upcoming = []
+    for series in series_list:
+        if not is_active(series, today):
+            continue
+        for expected in project_occurrences(series, today, end_date):
+            upcoming.append({
+                "date": expected,
+                "merchant": series.merchant,
+                "cadence": series.cadence,
+                "amount": series.typical_amount,
+                "series_id": series.id
+            })
+    upcoming.sort(key=lambda item: item["date"])
+    
+    by_month = {}
+    for item in upcoming:
+        month = by_month.setdefault(item["date"].strftime("%Y-%m"), {"inflows": 0.0, "outflows": 0.0})
+        if item["amount"] > 0:
+            month["inflows"] += item["amount"]
+        else:
+            month["outflows"] += abs(item["amount"])
+    
+    total_inflows = sum(m["inflows"] for m in by_month.values())
+    total_outflows = sum(m["outflows"] for m in by_month.values())
+    
+    return {
+        "report_type": "cash_flow_forecast",
+        "period": {
+            "start_date": today,
+            "end_date": end_date
+        },
+        "total_inflows": total_inflows,
+        "total_outflows": total_outflows,
+        "net": total_inflows - total_outflows,
+        "by_month": [
+            {"month": month, **totals, "net": totals["inflows"] - totals["outflows"]}
+            for month, totals in sorted(by_month.items())
+        ],
+        "upcoming": upcoming
+    }
@@ -1,12 +1,20 @@
 """
 Transactions API routes
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from app.db.session import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Response
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
+from app.db.session import get_db, get_read_db
 from app.core.auth import get_current_user
 from app.models.models import Transaction, TransactionStatus
-from pydantic import BaseModel, Field
+from app.services.search import search_transactions as run_search
+from app.services.tags import filter_by_tags, normalize_tag_names, set_transaction_tags, split_tag_names, tag_names_column
+from app.services.changes import record_change
+from app.services.audit import diff_values, is_review, record_review
+from app.services.conditional_update import conditional_update, current_version, make_etag, parse_etag
+from app.services.recurring import update_recurring_series
+from app.services.transfers import match_transfers, unpair_transfers
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 from datetime import date
 from uuid import UUID
@@ -23,6 +31,7 @@ class TransactionCreate(BaseModel):
     category_id: Optional[UUID] = None
     payment_method: Optional[str] = None
     notes: Optional[str] = None
+    tags: List[str] = []
 
 
 class TransactionUpdate(BaseModel):
@@ -35,6 +44,7 @@ class TransactionUpdate(BaseModel):
     notes: Optional[str] = None
     is_transfer: Optional[bool] = None
     is_owner_draw: Optional[bool] = None
+    tags: Optional[List[str]] = None
 
 
 class TransactionResponse(BaseModel):
@@ -48,11 +58,31 @@ class TransactionResponse(BaseModel):
     status: TransactionStatus
     notes: Optional[str]
     payment_method: Optional[str]
+    is_transfer: Optional[bool] = None
+    is_owner_draw: Optional[bool] = None
+    transfer_pair_id: Optional[UUID] = None
+    version: int
+    tags: List[str] = []
+    
+    @field_validator("tags", mode="before")
+    @classmethod
+    def tag_names(cls, tags):
+        """Tags are loaded as Tag rows; expose just their names"""
+        return [getattr(tag, "name", tag) for tag in tags or []]
     
     class Config:
         from_attributes = True
 
 
+class TransactionSearchResult(TransactionResponse):
+    rank: float
+
+
+class TransactionSearchResponse(BaseModel):
+    results: List[TransactionSearchResult]
+    next_cursor: Optional[str]
+
+
 @router.get("/", response_model=List[TransactionResponse])
 async def list_transactions(
     skip: int = Query(0, ge=0),
@@ -60,13 +90,15 @@ async def list_transactions(
     status: Optional[TransactionStatus] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
+    tags: Optional[List[str]] = Query(None, description="Only transactions with these tags"),
+    tag_match: str = Query("any", pattern="^(any|all)$"),
     user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     List all transactions for the current user's organization
     """
-    query = db.query(Transaction).filter(
+    query = db.query(Transaction).options(selectinload(Transaction.tags)).filter(
         Transaction.organization_id == user["user_id"]
     )
     
@@ -77,6 +109,8 @@ async def list_transactions(
         query = query.filter(Transaction.date >= start_date)
     if end_date:
         query = query.filter(Transaction.date <= end_date)
+    if tags:
+        query = filter_by_tags(query, user["user_id"], tags, match=tag_match)
     
     # Order by date descending
     query = query.order_by(Transaction.date.desc())
@@ -88,6 +122,7 @@ async def list_transactions(
 @router.post("/", response_model=TransactionResponse, status_code=201)
 async def create_transaction(
     transaction: TransactionCreate,
+    response: Response,
     user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -96,19 +131,72 @@ async def create_transaction(
     """
     db_transaction = Transaction(
         organization_id=user["user_id"],
-        **transaction.model_dump()
+        **transaction.model_dump(exclude={"tags"})
     )
+    set_transaction_tags(db, db_transaction, transaction.tags)
     
     db.add(db_transaction)
+    db.flush()
+    match_transfers(db, user["user_id"], [db_transaction])
+    update_recurring_series(db, user["user_id"], [db_transaction])
+    record_change(db, user["user_id"], "transaction", db_transaction.id, "inserted")
     db.commit()
     db.refresh(db_transaction)
     
+    response.headers["ETag"] = make_etag(db_transaction.version)
     return db_transaction
 
 
+@router.get("/search", response_model=TransactionSearchResponse)
+async def search_transactions(
+    q: str = Query(..., min_length=1, max_length=200),
+    sort: str = Query("relevance", pattern="^(relevance|date)$"),
+    status: Optional[TransactionStatus] = None,
+    category_id: Optional[UUID] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    user: dict = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Search transactions by description, merchant and notes
+    Pass the returned next_cursor to fetch the following page
+    """
+    try:
+        results, next_cursor = run_search(
+            db,
+            user["user_id"],
+            q,
+            sort=sort,
+            status=status,
+            category_id=category_id,
+            start_date=start_date,
+            end_date=end_date,
+            min_amount=min_amount,
+            max_amount=max_amount,
+            limit=limit,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "results": [
+            {**TransactionResponse.model_validate(transaction).model_dump(), "rank": rank}
+            for transaction, rank in results
+        ],
+        "next_cursor": next_cursor
+    }
+
+
 @router.get("/{transaction_id}", response_model=TransactionResponse)
 async def get_transaction(
     transaction_id: UUID,
+    response: Response,
     user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -123,6 +211,7 @@ async def get_transaction(
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
+    response.headers["ETag"] = make_etag(transaction.version)
     return transaction
 
 
@@ -130,29 +219,77 @@ async def get_transaction(
 async def update_transaction(
     transaction_id: UUID,
     transaction_update: TransactionUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None, description='ETag from a previous read, e.g. "3"'),
     user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     Update a transaction
+    Send If-Match with the transaction's ETag to reject the edit (409) if
+    someone else changed it since it was read
     """
-    transaction = db.query(Transaction).filter(
-        Transaction.id == transaction_id,
-        Transaction.organization_id == user["user_id"]
-    ).first()
+    expected_version = None
+    if if_match and if_match.strip() != "*":
+        expected_version = parse_etag(if_match)
+        if expected_version is None:
+            raise HTTPException(status_code=400, detail="Invalid If-Match header")
     
-    if not transaction:
-        raise HTTPException(status_code=404, detail="Transaction not found")
-    
-    # Update fields
     update_data = transaction_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(transaction, field, value)
+    tags = update_data.pop("tags", None)
+    reviewed = is_review(update_data)
+    
+    # Review stamp goes out with the same UPDATE
+    values = dict(update_data)
+    if reviewed:
+        values["reviewed_by"] = user["user_id"]
+        values["reviewed_at"] = func.now()
+    
+    # Unchanged tags come back with the UPDATE instead of a lazy load
+    result = conditional_update(
+        db,
+        user["user_id"],
+        transaction_id,
+        values,
+        expected_version=expected_version,
+        previous_fields=set(update_data) | {"category_id"},
+        extra_columns=[tag_names_column(db)] if tags is None else []
+    )
+    if result is None:
+        version = current_version(db, user["user_id"], transaction_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Transaction not found")
+        raise HTTPException(
+            status_code=409,
+            detail="Transaction was modified by someone else; reload and retry",
+            headers={"ETag": make_etag(version)}
+        )
+    transaction, previous, extra = result
     
+    changes = diff_values(previous, update_data)
+    if tags is not None:
+        changes += diff_values(
+            {"tags": sorted(tag.name for tag in transaction.tags)},
+            {"tags": sorted(normalize_tag_names(tags))}
+        )
+        set_transaction_tags(db, transaction, tags)
+    
+    # Audit/history rows are batched
+    record_review(db, transaction, user["user_id"], changes, previous["category_id"], reviewed)
+    record_change(db, user["user_id"], "transaction", transaction.id, "updated")
+    
+    # Serialize before commit so the response doesn't need a refresh SELECT
+    if tags is None:
+        updated = TransactionResponse.model_validate({
+            **{field: getattr(transaction, field) for field in TransactionResponse.model_fields if field != "tags"},
+            "tags": split_tag_names(extra["tag_names"])
+        })
+    else:
+        updated = TransactionResponse.model_validate(transaction)
     db.commit()
-    db.refresh(transaction)
     
-    return transaction
+    response.headers["ETag"] = make_etag(updated.version)
+    return updated
 
 
 @router.delete("/{transaction_id}")
@@ -172,7 +309,10 @@ async def delete_transaction(
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
+    # The other leg of a transfer is income/expense again once this one is gone
+    unpair_transfers(db, user["user_id"], [transaction.id])
     db.delete(transaction)
+    record_change(db, user["user_id"], "transaction", transaction.id, "deleted")
     db.commit()
     
     return {"message": "Transaction deleted successfully"}
@@ -183,7 +323,7 @@ async def get_transaction_summary(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get transaction summary statistics including income/expense breakdown
@@ -14,6 +14,16 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str
+    DATABASE_REPLICA_URL: str = ""  # Optional read replica for reports/list endpoints
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+    REPLICA_POOL_SIZE: int = 5
+    REPLICA_MAX_OVERFLOW: int = 10
+    REPLICA_MAX_LAG_SECONDS: float = 5.0  # route reads to primary when replica is further behind
+    REPLICA_HEALTH_CHECK_SECONDS: float = 5.0  # how long a lag/health probe result is reused
+    READ_YOUR_WRITES_SECONDS: float = 5.0  # lifetime of the client's read-after cookie
     
     # Supabase
     SUPABASE_URL: str
@@ -25,6 +35,42 @@ class Settings(BaseSettings):
     # CORS - will be parsed from comma-separated string
     ALLOWED_ORIGINS: str = "http://localhost:3000"
     
+    # Change feed (SSE)
+    CHANGE_FEED_POLL_SECONDS: float = 5.0  # catch writes made by other processes
+    CHANGE_FEED_BATCH_SIZE: int = 500
+    
+    # Audit / classification-history write buffer
+    AUDIT_FLUSH_SIZE: int = 200  # flush once this many rows are buffered
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = 2.0  # ...or this long after the first one
+    
+    # Per-organization admission control (429 + Retry-After when exceeded)
+    RATE_LIMIT_ENABLED: bool = True
+    REPORTS_RATE_PER_MINUTE: float = 60  # reports and analytics
+    REPORTS_BURST: int = 10
+    REPORTS_MAX_CONCURRENT: int = 2
+    UPLOADS_RATE_PER_MINUTE: float = 20  # uploads and processing
+    UPLOADS_BURST: int = 5
+    UPLOADS_MAX_CONCURRENT: int = 2
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 2.0  # wait this long for a concurrency slot
+    
+    # Startup
+    PRELOAD_HEAVY_MODULES: bool = False  # import pandas/parsers in the master before workers fork
+    
+    # Document processing
+    DOCUMENT_BATCH_SIZE: int = 1000  # rows inserted per commit/checkpoint
+    DOCUMENT_STALE_AFTER_SECONDS: float = 600  # PROCESSING without a checkpoint this long is failed
+    DOCUMENT_REAPER_INTERVAL_SECONDS: float = 60
+    
+    # File storage: "local" keeps files in STORAGE_DIR; "s3" keeps them in
+    # AWS_BUCKET_NAME (S3 or Supabase Storage's S3 endpoint) and uses
+    # STORAGE_DIR as a local read cache (archives are memory-mapped)
+    STORAGE_BACKEND: str = "local"
+    STORAGE_DIR: str = "storage"
+    STORAGE_ENDPOINT_URL: str = ""  # e.g. https://<project>.supabase.co/storage/v1/s3
+    
+    # Archival of closed fiscal periods
+    ARCHIVE_MIN_AGE_DAYS: int = 365  # periods ending more recently than this stay hot
+    
     # AWS (optional)
     AWS_ACCESS_KEY_ID: str = ""
     AWS_SECRET_ACCESS_KEY: str = ""
@@ -0,0 +1,143 @@
+"""
+Per-organization rate limiting and concurrency admission control
+
+Expensive routes get a token bucket (sustained rate + burst) and a cap on
+in-flight requests per organization. Requests over the rate are rejected
+with 429 and Retry-After; requests over the concurrency cap wait briefly
+for a slot, then get 429. Cheap routes are not limited at all.
+
+Token buckets live in a pluggable backend: in-memory by default (per
+process), or a shared store set via set_rate_limit_backend().
+Concurrency caps are per process.
+"""
+import asyncio
+import math
+from abc import ABC, abstractmethod
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+from fastapi import Depends, HTTPException, status
+from app.core.auth import get_current_user
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class AdmissionPolicy:
+    rate_per_second: float
+    burst: int
+    max_concurrent: int
+
+
+POLICIES = {
+    "reports": AdmissionPolicy(
+        rate_per_second=settings.REPORTS_RATE_PER_MINUTE / 60,
+        burst=settings.REPORTS_BURST,
+        max_concurrent=settings.REPORTS_MAX_CONCURRENT,
+    ),
+    "uploads": AdmissionPolicy(
+        rate_per_second=settings.UPLOADS_RATE_PER_MINUTE / 60,
+        burst=settings.UPLOADS_BURST,
+        max_concurrent=settings.UPLOADS_MAX_CONCURRENT,
+    ),
+}
+
+
+class RateLimitBackend(ABC):
+    """Token bucket storage; implement take() for a shared store"""
+
+    @abstractmethod
+    def take(self, key: str, rate_per_second: float, capacity: int, cost: float = 1.0) -> float:
+        """
+        Take cost tokens from the bucket
+
+        Returns:
+            0 if allowed, otherwise seconds until enough tokens accumulate
+        """
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Per-process token buckets"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, updated_at)
+
+    def take(self, key: str, rate_per_second: float, capacity: int, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (float(capacity), now))
+            tokens = min(float(capacity), tokens + (now - updated_at) * rate_per_second)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (cost - tokens) / rate_per_second
+
+
+class ConcurrencyLimiter:
+    """Caps in-flight requests per key within this process"""
+
+    def __init__(self):
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    async def acquire(self, key: str, limit: int, timeout: float) -> bool:
+        semaphore = self._semaphores.setdefault(key, asyncio.Semaphore(limit))
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def release(self, key: str) -> None:
+        self._semaphores[key].release()
+
+
+rate_limit_backend: RateLimitBackend = InMemoryRateLimitBackend()
+concurrency_limiter = ConcurrencyLimiter()
+
+
+def set_rate_limit_backend(backend: RateLimitBackend) -> None:
+    """Swap in a shared backend (e.g. Redis) so limits hold across workers"""
+    global rate_limit_backend
+    rate_limit_backend = backend
+
+
+def _too_many_requests(detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+def admission_control(policy_name: str):
+    """
+    Dependency factory enforcing a policy per organization
+    Usage:
+        @router.get("/expensive", dependencies=[Depends(admission_control("reports"))])
+    """
+    policy = POLICIES[policy_name]
+
+    async def dependency(user: dict = Depends(get_current_user)):
+        if not settings.RATE_LIMIT_ENABLED:
+            yield
+            return
+
+        key = f"{policy_name}:{user['user_id']}"
+        if not await concurrency_limiter.acquire(key, policy.max_concurrent, settings.ADMISSION_QUEUE_TIMEOUT_SECONDS):
+            raise _too_many_requests(
+                "Too many concurrent requests for this organization",
+                settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+            )
+        try:
+            # Only requests that got a slot spend a token
+            retry_after = rate_limit_backend.take(key, policy.rate_per_second, policy.burst)
+            if retry_after > 0:
+                raise _too_many_requests("Rate limit exceeded for this organization", retry_after)
+            yield
+        finally:
+            concurrency_limiter.release(key)
+
+    return dependency
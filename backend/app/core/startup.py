@@ -0,0 +1,106 @@
+"""
+Startup helpers: pre-fork warm-up, post-fork cleanup and import-time profiling
+
+Profile mode:
+    python -m app.core.startup --top 25
+    python -m app.core.startup --budget 1.0   # exit 1 if `import app.main` is slower
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_fork_hooks_installed = False
+
+
+def warm_up(modules: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """
+    Import heavy modules ahead of time (e.g. in a pre-fork master) so workers
+    inherit them instead of paying the import on their first request
+
+    Modules that aren't installed are skipped.
+
+    Returns:
+        Seconds spent importing each module
+    """
+    from app.services.loaders import HEAVY_MODULES, load_module
+
+    timings = {}
+    for name in modules or HEAVY_MODULES:
+        started = time.perf_counter()
+        try:
+            load_module(name)
+        except ImportError:
+            continue
+        timings[name] = time.perf_counter() - started
+    return timings
+
+
+def _after_fork_in_child() -> None:
+    """Pooled connections must not be shared with the parent process"""
+    from app.db.session import engine, replica_engine
+
+    engine.dispose(close=False)
+    if replica_engine is not None:
+        replica_engine.dispose(close=False)
+
+
+def install_fork_hooks() -> None:
+    """Reset per-process state in forked workers (idempotent)"""
+    global _fork_hooks_installed
+    if _fork_hooks_installed or not hasattr(os, "register_at_fork"):
+        return
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+    _fork_hooks_installed = True
+
+
+def import_time_profile(target: str = "app.main") -> Tuple[float, List[Tuple[str, int, int]]]:
+    """
+    Import target in a fresh interpreter with -X importtime
+
+    Returns:
+        (wall seconds, [(module, self_us, cumulative_us), ...])
+    """
+    code = (
+        "import time; started = time.perf_counter(); "
+        f"import {target}; print(time.perf_counter() - started)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return float(result.stdout.strip().splitlines()[-1]), modules
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Profile API process import time")
+    parser.add_argument("--target", default="app.main")
+    parser.add_argument("--top", type=int, default=20, help="Show the N slowest imports (cumulative)")
+    parser.add_argument("--budget", type=float, help="Fail if the import takes longer (seconds)")
+    args = parser.parse_args(argv)
+
+    wall, modules = import_time_profile(args.target)
+    print(f"import {args.target}: {wall:.3f}s")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cumulative_us in sorted(modules, key=lambda m: m[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+    if args.budget is not None and wall > args.budget:
+        print(f"Startup budget exceeded: {wall:.3f}s > {args.budget:.3f}s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
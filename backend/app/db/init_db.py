@@ -7,15 +7,22 @@ from app.models.models import (
     User,
     Document,
     Category,
+    Tag,
     Transaction,
-    ClassificationHistory
+    RecurringSeries,
+    ClassificationHistory,
+    TransactionAudit,
+    TransactionArchive,
+    ChangeEvent
 )
+from app.services.search import create_search_index
 
 
 def init_db():
     """Create all database tables"""
     print("Creating database tables...")
     Base.metadata.create_all(bind=engine)
+    create_search_index(engine)
     print("Database tables created successfully!")
 
 
@@ -1,25 +1,173 @@
 """
 Database connection and session management
 """
-from sqlalchemy import create_engine
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import create_engine, event, select, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from app.core.auth import get_current_user
 from app.core.config import settings
 
 # Create database engine
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,  # Verify connections before using
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
     echo=settings.DEBUG  # Log SQL queries in debug mode
 )
 
-# Create session factory
+# Optional read replica with its own pool, so heavy reports don't starve writes
+replica_engine = create_engine(
+    settings.DATABASE_REPLICA_URL,
+    pool_pre_ping=True,
+    pool_size=settings.REPLICA_POOL_SIZE,
+    max_overflow=settings.REPLICA_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    echo=settings.DEBUG
+) if settings.DATABASE_REPLICA_URL else None
+
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine or engine)
 
 # Base class for models
 Base = declarative_base()
 
 
+# Read-your-writes marker: after a request commits changes, the client gets
+# the organization's change seq (cookie + X-Change-Seq header) and sends it
+# back; reads go to the replica only once it has replayed that seq. Being
+# carried by the client, it works across worker processes and servers.
+READ_AFTER_COOKIE = "kern_read_after"
+READ_AFTER_HEADER = "X-Read-After"
+CHANGE_SEQ_HEADER = "X-Change-Seq"
+_write_marker: ContextVar[Optional[dict]] = ContextVar("write_marker", default=None)
+
+
+class ReplicaRouter:
+    """
+    Decides whether a read may go to the replica
+
+    Falls back to the primary when the replica is unreachable or lagging more
+    than REPLICA_MAX_LAG_SECONDS, and when the client's read-after marker
+    names a change the replica hasn't replayed yet.
+    """
+
+    # Postgres standby lag; 0 when fully replayed (an idle primary has no lag)
+    LAG_SQL = (
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    )
+
+    def __init__(self, replica):
+        self.replica = replica
+        self._healthy = True
+        self._checked_at = 0.0
+
+    def replica_healthy(self) -> bool:
+        now = time.monotonic()
+        if now - self._checked_at < settings.REPLICA_HEALTH_CHECK_SECONDS:
+            return self._healthy
+
+        healthy = True
+        try:
+            with self.replica.connect() as conn:
+                if self.replica.dialect.name == "postgresql":
+                    lag = conn.execute(text(self.LAG_SQL)).scalar() or 0
+                    healthy = float(lag) <= settings.REPLICA_MAX_LAG_SECONDS
+                else:
+                    conn.execute(text("SELECT 1"))
+        except Exception:
+            healthy = False
+
+        self._healthy, self._checked_at = healthy, now
+        return healthy
+
+    def replica_caught_up(self, organization_id, change_seq: int) -> bool:
+        """Whether the replica has replayed the organization's change_seq"""
+        from app.models.models import Organization
+
+        try:
+            with self.replica.connect() as conn:
+                replayed = conn.execute(
+                    select(Organization.change_seq).where(Organization.id == organization_id)
+                ).scalar()
+        except Exception:
+            return False
+        return replayed is not None and replayed >= change_seq
+
+    def use_replica(self, organization_id, read_after: Optional[int] = None) -> bool:
+        if self.replica is None or not self.replica_healthy():
+            return False
+        if organization_id and read_after:
+            return self.replica_caught_up(organization_id, read_after)
+        return True
+
+
+replica_router = ReplicaRouter(replica_engine)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_change_seq(session):
+    """Hand the committed change seq to the request's write marker"""
+    committed = session.info.pop("change_seqs", None)
+    marker = _write_marker.get()
+    if committed and marker is not None:
+        marker.update(committed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_change_seq(session):
+    session.info.pop("change_seqs", None)
+
+
+async def track_writes(request: Request, call_next):
+    """
+    HTTP middleware: after a request commits changes, give the client the
+    organization's change seq to read after
+    """
+    marker: dict = {}
+    token = _write_marker.set(marker)
+    try:
+        response = await call_next(request)
+    finally:
+        _write_marker.reset(token)
+    if len(marker) == 1:
+        (organization_id, change_seq), = marker.items()
+        value = f"{organization_id}:{change_seq}"
+        response.headers[CHANGE_SEQ_HEADER] = str(change_seq)
+        secure = settings.ENVIRONMENT != "development"
+        response.set_cookie(
+            READ_AFTER_COOKIE,
+            value,
+            max_age=int(settings.READ_YOUR_WRITES_SECONDS) or 1,
+            httponly=True,
+            secure=secure,
+            samesite="none" if secure else "lax",
+        )
+    return response
+
+
+def _read_after(request: Request, organization_id) -> Optional[int]:
+    """Change seq the client must see, from X-Read-After or the cookie"""
+    header = request.headers.get(READ_AFTER_HEADER)
+    if header and header.isdigit():
+        return int(header)
+    cookie = request.cookies.get(READ_AFTER_COOKIE, "")
+    cookie_organization, _, change_seq = cookie.rpartition(":")
+    if cookie_organization == str(organization_id) and change_seq.isdigit():
+        return int(change_seq)
+    return None
+
+
 # Dependency for getting DB session
 def get_db():
     """
@@ -34,3 +182,20 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Dependency for read-only routes (reports, list endpoints)
+def get_read_db(request: Request, user: dict = Depends(get_current_user)):
+    """
+    Dependency that provides a read-only session, on the replica when it is
+    configured, healthy and caught up with the client's last write;
+    otherwise on the primary
+    """
+    organization_id = user.get("user_id")
+    use_replica = replica_router.use_replica(organization_id, _read_after(request, organization_id))
+    factory = ReadSessionLocal if use_replica else SessionLocal
+    db = factory()
+    try:
+        yield db
+    finally:
+        db.close()
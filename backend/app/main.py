@@ -1,10 +1,24 @@
 """
 Main FastAPI application entry point
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.api import auth, transactions, documents, reports
+from app.core.ratelimit import admission_control
+from app.api import auth, transactions, documents, reports, changes, analytics, recurring, archive
+from app.services.archive import ArchiveUnavailableError
+from app.services.audit import audit_buffer
+from app.services.ingest import document_reaper
+from app.core.startup import install_fork_hooks, warm_up
+from app.db.session import CHANGE_SEQ_HEADER, track_writes
+
+# Fork-based servers (gunicorn --preload, multiprocessing) get fresh DB pools
+# per worker; with PRELOAD_HEAVY_MODULES the master also imports the heavy
+# stack once so forked workers start warm
+install_fork_hooks()
+if settings.PRELOAD_HEAVY_MODULES:
+    warm_up()
 
 app = FastAPI(
     title="KERN Financial AI API",
@@ -21,13 +35,50 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After", CHANGE_SEQ_HEADER],
 )
 
+# Clients that just wrote get a marker so their next reads see the write
+app.middleware("http")(track_writes)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(transactions.router, prefix="/api/transactions", tags=["transactions"])
 app.include_router(documents.router, prefix="/api/documents", tags=["documents"])
 app.include_router(reports.router, prefix="/api/reports", tags=["reports"])
+app.include_router(changes.router, prefix="/api/changes", tags=["changes"])
+app.include_router(
+    analytics.router,
+    prefix="/api/analytics",
+    tags=["analytics"],
+    dependencies=[Depends(admission_control("reports"))]
+)
+app.include_router(recurring.router, prefix="/api/recurring", tags=["recurring"])
+app.include_router(archive.router, prefix="/api/archive", tags=["archive"])
+
+
+@app.on_event("startup")
+async def start_background_writers():
+    """Start batched audit/classification-history writes and the stale-document reaper"""
+    audit_buffer.start()
+    document_reaper.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_writers():
+    """Flush anything still buffered before the process exits"""
+    document_reaper.stop()
+    audit_buffer.stop()
+
+
+@app.exception_handler(ArchiveUnavailableError)
+async def archive_unavailable(request: Request, exc: ArchiveUnavailableError):
+    """Reports over archived periods fail soft while storage is unreachable"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Archived data is temporarily unavailable; try again later"},
+        headers={"Retry-After": "30"}
+    )
 
 
 @app.get("/")
@@ -1,11 +1,12 @@
 """
 SQLAlchemy database models
 """
-from sqlalchemy import Column, String, Float, Date, Boolean, DateTime, ForeignKey, Text, Integer, Enum as SQLEnum
+from sqlalchemy import Column, String, Float, Date, Boolean, DateTime, ForeignKey, Text, Integer, BigInteger, Table, Index, UniqueConstraint, Enum as SQLEnum
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.session import Base
+from app.services.merchants import normalize_merchant
 import uuid
 import enum
 
@@ -40,6 +41,7 @@ class Organization(Base):
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(255), nullable=False)
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")  # last ChangeEvent.seq handed out
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -85,9 +87,16 @@ class Document(Base):
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
     processed_at = Column(DateTime(timezone=True))
     
+    # Resumable processing: everything before checkpoint_offset is committed
+    checkpoint_offset = Column(Integer, nullable=False, default=0, server_default="0")  # data rows (CSV/Excel) or pages (PDF)
+    rows_imported = Column(Integer, nullable=False, default=0, server_default="0")
+    rows_skipped = Column(Integer, nullable=False, default=0, server_default="0")  # unparseable rows
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")  # fences off superseded runs
+    checkpoint_at = Column(DateTime(timezone=True))  # heartbeat; stale PROCESSING documents are reaped
+    
     # Relationships
     organization = relationship("Organization", back_populates="documents")
-    transactions = relationship("Transaction", back_populates="source_document")
+    transactions = relationship("Transaction", back_populates="source_document", passive_deletes=True)
 
 
 class Category(Base):
@@ -110,21 +119,58 @@ class Category(Base):
     parent = relationship("Category", remote_side=[id])
 
 
+# Many-to-many link between transactions and tags
+transaction_tags = Table(
+    "transaction_tags",
+    Base.metadata,
+    Column("transaction_id", UUID(as_uuid=True), ForeignKey("transactions.id", ondelete="CASCADE"), primary_key=True),
+    Column("tag_id", UUID(as_uuid=True), ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+    Index("idx_transaction_tags_tag_id", "tag_id"),
+)
+
+
+class Tag(Base):
+    """
+    Per-organization transaction tags
+    """
+    __tablename__ = "tags"
+    __table_args__ = (
+        UniqueConstraint("organization_id", "name", name="uq_tags_org_name"),
+    )
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    organization_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id"), nullable=False)
+    name = Column(String(100), nullable=False)  # normalized: trimmed, lowercase
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationships
+    transactions = relationship("Transaction", secondary=transaction_tags, back_populates="tags")
+
+
+def _merchant_key_default(context):
+    return normalize_merchant(context.get_current_parameters().get("merchant")) or None
+
+
 class Transaction(Base):
     """
     Financial transactions
     """
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Recurring detection looks up a merchant's history
+        Index("idx_transactions_org_merchant_key", "organization_id", "merchant_key", "date"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     organization_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id"), nullable=False)
-    source_document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id"))
+    source_document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id", ondelete="SET NULL"))  # imported rows outlive their statement
     
     # Transaction details
     date = Column(Date, nullable=False)
     amount = Column(Float, nullable=False)
     description = Column(String(500))
     merchant = Column(String(255))
+    merchant_key = Column(String(255), default=_merchant_key_default)  # normalized merchant; set on insert, and by conditional_update
     
     # Categorization
     category_id = Column(UUID(as_uuid=True), ForeignKey("categories.id"))
@@ -137,12 +183,14 @@ class Transaction(Base):
     
     # Metadata
     notes = Column(Text)
-    tags = Column(String(500))  # Comma-separated tags
     is_transfer = Column(Boolean, default=False)  # Internal transfer (not expense/income)
     is_owner_draw = Column(Boolean, default=False)
+    transfer_pair_id = Column(UUID(as_uuid=True), ForeignKey("transactions.id", ondelete="SET NULL"))  # other leg of a matched transfer
     payment_method = Column(String(50))  # cash, card, ach, check
+    recurring_series_id = Column(UUID(as_uuid=True), ForeignKey("recurring_series.id", ondelete="SET NULL"), index=True)
     
     # Audit
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # optimistic concurrency / ETag
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -150,6 +198,36 @@ class Transaction(Base):
     organization = relationship("Organization", back_populates="transactions")
     source_document = relationship("Document", back_populates="transactions")
     category = relationship("Category", back_populates="transactions")
+    tags = relationship("Tag", secondary=transaction_tags, back_populates="transactions")
+    recurring_series = relationship("RecurringSeries", back_populates="transactions")
+
+
+class RecurringSeries(Base):
+    """
+    Detected recurring transactions (rent, subscriptions, payroll)
+    """
+    __tablename__ = "recurring_series"
+    __table_args__ = (
+        # Not unique: a merchant can bill several series (e.g. two plans)
+        Index("idx_recurring_series_org_merchant", "organization_id", "merchant_key", "direction"),
+    )
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    organization_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id"), nullable=False)
+    merchant_key = Column(String(255), nullable=False)  # normalized merchant name
+    merchant = Column(String(255))  # display name (most recent raw merchant)
+    direction = Column(String(10), nullable=False)  # inflow, outflow
+    cadence = Column(String(20), nullable=False)  # weekly, biweekly, monthly, quarterly, annual
+    typical_amount = Column(Float, nullable=False)
+    occurrence_count = Column(Integer, nullable=False, default=0)
+    first_date = Column(Date, nullable=False)
+    last_date = Column(Date, nullable=False)
+    next_expected_date = Column(Date, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Relationships
+    transactions = relationship("Transaction", back_populates="recurring_series")
 
 
 class ClassificationHistory(Base):
@@ -159,7 +237,7 @@ class ClassificationHistory(Base):
     __tablename__ = "classification_history"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    transaction_id = Column(UUID(as_uuid=True), ForeignKey("transactions.id"))
+    transaction_id = Column(UUID(as_uuid=True), ForeignKey("transactions.id", ondelete="SET NULL"))  # history outlives deletes
     
     # AI suggestion
     suggested_category_id = Column(UUID(as_uuid=True), ForeignKey("categories.id"))
@@ -171,3 +249,68 @@ class ClassificationHistory(Base):
     actual_category_id = Column(UUID(as_uuid=True), ForeignKey("categories.id"))
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class TransactionAudit(Base):
+    """
+    Append-only field-level audit trail of transaction edits
+    """
+    __tablename__ = "transaction_audit"
+    __table_args__ = (
+        Index("idx_transaction_audit_transaction_id", "transaction_id"),
+    )
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    organization_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id"), nullable=False)
+    transaction_id = Column(UUID(as_uuid=True), nullable=False)  # no FK: audit outlives deletes
+    user_id = Column(UUID(as_uuid=True))
+    field = Column(String(100), nullable=False)
+    old_value = Column(Text)
+    new_value = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class TransactionArchive(Base):
+    """
+    A closed fiscal period moved out of transactions into a Parquet file
+    """
+    __tablename__ = "transaction_archives"
+    __table_args__ = (
+        Index("idx_transaction_archives_org_dates", "organization_id", "min_date", "max_date"),
+    )
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    organization_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id"), nullable=False)
+    period_start = Column(Date, nullable=False)
+    period_end = Column(Date, nullable=False)
+    
+    # File stats: reports only open files whose date range overlaps theirs
+    min_date = Column(Date, nullable=False)
+    max_date = Column(Date, nullable=False)
+    row_count = Column(Integer, nullable=False)
+    total_amount = Column(Float, nullable=False)  # checksum for restore
+    
+    storage_key = Column(String(500), nullable=False)  # path within the storage layer
+    size_bytes = Column(BigInteger)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ChangeEvent(Base):
+    """
+    Append-only per-organization change log feeding the dashboard change stream
+    """
+    __tablename__ = "change_events"
+    __table_args__ = (
+        Index("idx_change_events_org_id_id", "organization_id", "id"),
+        UniqueConstraint("organization_id", "seq", name="uq_change_events_org_seq"),
+    )
+    
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    organization_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id"), nullable=False)
+    # Per-organization sequence in commit order; the SSE event id / resume cursor
+    seq = Column(BigInteger, nullable=False)
+    entity = Column(String(50), nullable=False)  # transaction, document
+    entity_id = Column(UUID(as_uuid=True), nullable=False)
+    action = Column(String(50), nullable=False)  # inserted, updated, deleted, status_changed, checkpoint
+    status = Column(String(50))  # new status for status changes
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
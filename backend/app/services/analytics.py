@@ -0,0 +1,208 @@
+"""
+Vectorized ledger analytics: outliers and spending trends
+
+An organization's ledger is loaded once as columns (a single column-select,
+no ORM objects) into a pandas DataFrame and cached per organization. The
+cache is keyed on the organization's latest change-log id, so any write
+recorded through app.services.changes invalidates it.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.models import Transaction, TransactionStatus
+from app.services.changes import get_latest_change_id
+from app.services.merchants import MERCHANT_NOISE_PATTERN
+
+LEDGER_COLUMNS = (
+    Transaction.id,
+    Transaction.date,
+    Transaction.amount,
+    Transaction.merchant,
+    Transaction.category_id,
+    Transaction.status,
+    Transaction.is_transfer,
+)
+
+# Outliers need a reasonably sized peer group to be meaningful
+MIN_GROUP_SIZE = 5
+# Deviation floor for peers with (nearly) constant amounts, e.g. a fixed fee
+MIN_STD_FRACTION = 0.05
+MIN_STD = 0.01
+DEFAULT_Z_THRESHOLD = 3.0
+ROLLING_MONTHS = 3
+
+
+def normalize_merchants(merchants: pd.Series) -> pd.Series:
+    """Vectorized app.services.merchants.normalize_merchant"""
+    return (
+        merchants.fillna("")
+        .str.lower()
+        .str.replace(MERCHANT_NOISE_PATTERN, " ", regex=True)
+        .str.strip()
+    )
+
+
+def load_ledger(db: Session, organization_id) -> pd.DataFrame:
+    """Load an organization's transactions as a columnar DataFrame"""
+    rows = db.execute(
+        select(*LEDGER_COLUMNS).where(Transaction.organization_id == organization_id)
+    ).all()
+    frame = pd.DataFrame(rows, columns=[column.key for column in LEDGER_COLUMNS])
+    frame["date"] = pd.to_datetime(frame["date"])
+    frame["amount"] = frame["amount"].astype("float64")
+    frame["is_transfer"] = frame["is_transfer"].fillna(False).astype(bool)
+    frame["merchant_key"] = normalize_merchants(frame["merchant"])
+    return frame
+
+
+class LedgerCache:
+    """Per-organization LRU cache of ledger frames, invalidated by data version"""
+
+    def __init__(self, max_organizations: int = 32):
+        self.max_organizations = max_organizations
+        self._lock = threading.Lock()
+        self._frames: "OrderedDict[str, Tuple[int, pd.DataFrame]]" = OrderedDict()
+
+    def get(self, db: Session, organization_id) -> pd.DataFrame:
+        key = str(organization_id)
+        version = get_latest_change_id(db, organization_id)
+        with self._lock:
+            cached = self._frames.get(key)
+            if cached and cached[0] == version:
+                self._frames.move_to_end(key)
+                return cached[1]
+
+        frame = load_ledger(db, organization_id)
+        with self._lock:
+            self._frames[key] = (version, frame)
+            self._frames.move_to_end(key)
+            while len(self._frames) > self.max_organizations:
+                self._frames.popitem(last=False)
+        return frame
+
+    def invalidate(self, organization_id) -> None:
+        with self._lock:
+            self._frames.pop(str(organization_id), None)
+
+
+ledger_cache = LedgerCache()
+
+
+def _peer_group(frame: pd.DataFrame) -> pd.Series:
+    """Merchant when known, otherwise category"""
+    category = "category:" + frame["category_id"].astype(str)
+    return frame["merchant_key"].where(frame["merchant_key"] != "", category)
+
+
+def find_outliers(
+    frame: pd.DataFrame,
+    z_threshold: float = DEFAULT_Z_THRESHOLD,
+    min_group_size: int = MIN_GROUP_SIZE,
+) -> pd.DataFrame:
+    """
+    Transactions whose amount is a z-score outlier within its merchant (or
+    category) group
+
+    Each row is scored against the rest of its group (leave-one-out), so a
+    single large charge doesn't inflate the mean and deviation it is
+    measured by. Peers that are all (nearly) identical get a deviation floor
+    of MIN_STD_FRACTION of their mean.
+
+    Returns a frame with the ledger columns plus group, group_mean,
+    group_std (of the row's peers) and z_score, sorted by |z| descending
+    """
+    ledger = frame[~frame["is_transfer"]].copy()
+    if ledger.empty:
+        return ledger.assign(group=[], group_mean=[], group_std=[], z_score=[])
+
+    ledger["group"] = _peer_group(ledger)
+    amounts = ledger.groupby("group")["amount"]
+    amount = ledger["amount"].to_numpy()
+    size = amounts.transform("size").to_numpy().astype("float64")
+    mean = amounts.transform("mean").to_numpy()
+    squares = (amount - mean) ** 2
+    spread = pd.Series(squares, index=ledger.index).groupby(ledger["group"]).transform("sum").to_numpy()
+
+    # Remove the row from its group's mean and sum of squared deviations
+    peers = size - 1
+    valid = size >= min_group_size
+    peer_mean = np.divide(size * mean - amount, peers, out=np.zeros(len(ledger)), where=valid)
+    peer_spread = np.clip(spread - (amount - mean) * (amount - peer_mean), 0, None)
+    peer_std = np.sqrt(np.divide(peer_spread, peers - 1, out=np.zeros(len(ledger)), where=valid))
+    peer_std = np.maximum(peer_std, np.maximum(MIN_STD_FRACTION * np.abs(peer_mean), MIN_STD))
+    ledger["group_mean"] = peer_mean
+    ledger["group_std"] = peer_std
+
+    z = np.zeros(len(ledger))
+    np.divide(amount - peer_mean, peer_std, out=z, where=valid)
+    ledger["z_score"] = z
+
+    outliers = ledger[np.abs(z) >= z_threshold]
+    return outliers.reindex(outliers["z_score"].abs().sort_values(ascending=False).index)
+
+
+def spending_trends(
+    frame: pd.DataFrame,
+    group_by: str = "category",
+    months: Optional[int] = 12,
+) -> Dict:
+    """
+    Monthly totals per category or merchant with rolling mean and
+    month-over-month deltas
+
+    Returns:
+        {"months": [...], "series": [{"key", "totals", "rolling_mean",
+        "mom_delta", "mom_pct"}, ...]}
+    """
+    ledger = frame[~frame["is_transfer"]]
+    if ledger.empty:
+        return {"months": [], "series": []}
+
+    if group_by == "merchant":
+        keys = ledger["merchant_key"].replace("", "(unknown)")
+    else:
+        keys = ledger["category_id"].astype(str).replace("None", "(uncategorized)")
+
+    monthly = ledger.assign(key=keys, month=ledger["date"].dt.to_period("M")).pivot_table(
+        index="month", columns="key", values="amount", aggfunc="sum", fill_value=0.0
+    )
+    # Dense month axis so gaps count as zero spend
+    monthly = monthly.reindex(
+        pd.period_range(monthly.index.min(), monthly.index.max(), freq="M"), fill_value=0.0
+    )
+
+    rolling = monthly.rolling(ROLLING_MONTHS, min_periods=1).mean()
+    delta = monthly.diff()
+    pct = monthly.pct_change(fill_method=None).replace([np.inf, -np.inf], np.nan)
+
+    if months:
+        monthly, rolling, delta, pct = (m.tail(months) for m in (monthly, rolling, delta, pct))
+
+    def values(column: pd.Series) -> List[Optional[float]]:
+        return [None if np.isnan(v) else round(float(v), 4) for v in column.to_numpy()]
+
+    return {
+        "months": [str(month) for month in monthly.index],
+        "series": [
+            {
+                "key": key,
+                "totals": values(monthly[key]),
+                "rolling_mean": values(rolling[key]),
+                "mom_delta": values(delta[key]),
+                "mom_pct": values(pct[key]),
+            }
+            for key in monthly.columns
+        ],
+    }
+
+
+def pending_outlier_ids(outliers: pd.DataFrame) -> List:
+    """Ids of outliers still awaiting review (candidates for FLAGGED)"""
+    pending = outliers["status"].map(lambda s: getattr(s, "value", s)) == TransactionStatus.PENDING.value
+    return outliers.loc[pending, "id"].tolist()
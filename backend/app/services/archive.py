@@ -0,0 +1,350 @@
+"""
+Archival of closed fiscal periods
+
+Old transactions are rarely edited but keep the hot table and its indexes
+large. Archiving moves a period's rows into a zstd-compressed Parquet file
+(sorted by date, so row-group statistics prune date filters) and records the
+file with its min/max dates. Reports combine hot rows with scan_archives(),
+which only opens files overlapping the requested range and memory-maps them.
+
+Archived rows lose their classification_history link (the history itself is
+kept) and no longer appear in transaction list/search; restore_archive()
+moves them back.
+"""
+import uuid
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, bindparam, delete, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import (
+    ClassificationHistory,
+    Document,
+    RecurringSeries,
+    Tag,
+    Transaction,
+    TransactionArchive,
+    TransactionStatus,
+    transaction_tags,
+)
+from app.services.changes import record_change
+from app.services.loaders import load_module
+from app.services.storage import storage
+from app.services.tags import get_or_create_tags
+
+# (column, kind) of every archived transaction field, in file order
+ARCHIVE_FIELDS = (
+    ("id", "uuid"),
+    ("source_document_id", "uuid"),
+    ("date", "date"),
+    ("amount", "float"),
+    ("description", "string"),
+    ("merchant", "string"),
+    ("category_id", "uuid"),
+    ("confidence_score", "float"),
+    ("status", "enum"),
+    ("reviewed_by", "uuid"),
+    ("reviewed_at", "timestamp"),
+    ("notes", "string"),
+    ("is_transfer", "bool"),
+    ("is_owner_draw", "bool"),
+    ("transfer_pair_id", "uuid"),
+    ("payment_method", "string"),
+    ("recurring_series_id", "uuid"),
+    ("version", "int"),
+    ("created_at", "timestamp"),
+    ("updated_at", "timestamp"),
+)
+ROW_GROUP_SIZE = 64 * 1024
+# Keeps IN (...) lists well under driver parameter limits
+CHUNK_SIZE = 1000
+
+
+class ArchiveUnavailableError(Exception):
+    """An archive's file can't be read from storage"""
+
+
+def _schema():
+    pa = load_module("pyarrow")
+    types = {
+        "uuid": pa.string(),
+        "enum": pa.string(),
+        "string": pa.string(),
+        "date": pa.date32(),
+        "float": pa.float64(),
+        "bool": pa.bool_(),
+        "int": pa.int32(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }
+    fields = [pa.field(name, types[kind]) for name, kind in ARCHIVE_FIELDS]
+    return pa.schema(fields + [pa.field("tags", pa.list_(pa.string()))])
+
+
+def _to_file_value(value, kind: str):
+    if value is None:
+        return None
+    if kind == "uuid":
+        return str(value)
+    if kind == "enum":
+        return getattr(value, "value", value)
+    return value
+
+
+def _from_file_value(value, kind: str):
+    if value is None:
+        return None
+    if kind == "uuid":
+        return uuid.UUID(value)
+    if kind == "enum":
+        return TransactionStatus(value)
+    return value
+
+
+def _chunks(values: Sequence, size: int = CHUNK_SIZE):
+    for offset in range(0, len(values), size):
+        yield values[offset:offset + size]
+
+
+def _tag_names(db: Session, transaction_ids: List) -> Dict:
+    names: Dict = {}
+    for chunk in _chunks(transaction_ids):
+        for transaction_id, name in db.execute(
+            select(transaction_tags.c.transaction_id, Tag.name)
+            .join(Tag, Tag.id == transaction_tags.c.tag_id)
+            .where(transaction_tags.c.transaction_id.in_(chunk))
+        ):
+            names.setdefault(transaction_id, []).append(name)
+    return names
+
+
+def _delete_rows(db: Session, organization_id, transaction_ids: List) -> None:
+    """
+    Remove archived rows and everything that references them; the rows are
+    recorded as deleted and hot transfer legs as updated in the change feed
+    """
+    archived = set(transaction_ids)
+    unlinked = set()
+    for chunk in _chunks(transaction_ids):
+        db.execute(
+            update(ClassificationHistory)
+            .where(ClassificationHistory.transaction_id.in_(chunk))
+            .values(transaction_id=None)
+        )
+        # Hot legs of archived transfers stay is_transfer; restore re-links them
+        unlinked.update(db.execute(
+            update(Transaction)
+            .where(Transaction.transfer_pair_id.in_(chunk))
+            .values(transfer_pair_id=None, version=Transaction.version + 1)
+            .returning(Transaction.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+        db.execute(delete(transaction_tags).where(transaction_tags.c.transaction_id.in_(chunk)))
+        db.execute(
+            delete(Transaction)
+            .where(Transaction.id.in_(chunk))
+            .execution_options(synchronize_session=False)
+        )
+
+    for transaction_id in transaction_ids:
+        record_change(db, organization_id, "transaction", transaction_id, "deleted")
+    for transaction_id in sorted(unlinked - archived, key=str):
+        record_change(db, organization_id, "transaction", transaction_id, "updated")
+
+
+def archive_period(db: Session, organization_id, period_start: date, period_end: date) -> TransactionArchive:
+    """
+    Move an organization's transactions dated within a closed period into
+    a Parquet file
+
+    The file is written first; the rows are deleted and the archive is
+    recorded in one commit, and the file is removed again if that fails.
+    Each moved row is recorded as deleted in the change feed.
+    Rows imported into the period later stay hot and can be archived into
+    another file.
+
+    Raises:
+        ValueError: If the period is still open or has no transactions
+    """
+    if period_start > period_end:
+        raise ValueError("period_start must be on or before period_end")
+    cutoff = date.today() - timedelta(days=settings.ARCHIVE_MIN_AGE_DAYS)
+    if period_end > cutoff:
+        raise ValueError(f"Only periods ending on or before {cutoff} can be archived")
+
+    columns = [getattr(Transaction, name) for name, _ in ARCHIVE_FIELDS]
+    rows = db.execute(
+        select(*columns).where(
+            Transaction.organization_id == organization_id,
+            Transaction.date >= period_start,
+            Transaction.date <= period_end
+        ).order_by(Transaction.date, Transaction.id).with_for_update()
+    ).all()
+    if not rows:
+        raise ValueError("No transactions in period")
+
+    transaction_ids = [row.id for row in rows]
+    tags = _tag_names(db, transaction_ids)
+    data = {
+        name: [_to_file_value(row[index], kind) for row in rows]
+        for index, (name, kind) in enumerate(ARCHIVE_FIELDS)
+    }
+    data["tags"] = [sorted(tags.get(transaction_id, [])) for transaction_id in transaction_ids]
+    table = load_module("pyarrow").table(data, schema=_schema())
+
+    key = f"archives/{organization_id}/{period_start:%Y%m%d}-{period_end:%Y%m%d}-{uuid.uuid4().hex}.parquet"
+    with storage.writing(key) as path:
+        load_module("pyarrow.parquet").write_table(
+            table, path, compression="zstd", row_group_size=ROW_GROUP_SIZE
+        )
+
+    archive = TransactionArchive(
+        organization_id=organization_id,
+        period_start=period_start,
+        period_end=period_end,
+        min_date=rows[0].date,
+        max_date=rows[-1].date,
+        row_count=len(rows),
+        total_amount=round(sum(row.amount for row in rows), 2),
+        storage_key=key,
+        size_bytes=storage.size(key),
+    )
+    try:
+        _delete_rows(db, organization_id, transaction_ids)
+        db.add(archive)
+        db.flush()
+        record_change(db, organization_id, "archive", archive.id, "created")
+        db.commit()
+    except Exception:
+        db.rollback()
+        storage.discard(key)
+        raise
+    return archive
+
+
+def _read(archive: TransactionArchive, columns: Optional[List[str]] = None, filters=None):
+    # OSError covers a missing file, an unreachable object store and local I/O
+    try:
+        path = storage.path(archive.storage_key)
+        return load_module("pyarrow.parquet").read_table(path, columns=columns, filters=filters, memory_map=True)
+    except OSError as e:
+        raise ArchiveUnavailableError(f"Archive {archive.id} file is unavailable") from e
+
+
+def _existing_ids(db: Session, column, ids) -> set:
+    found = set()
+    ids = list(ids)
+    for chunk in _chunks(ids):
+        found.update(db.execute(select(column).where(column.in_(chunk))).scalars())
+    return found
+
+
+def restore_archive(db: Session, archive: TransactionArchive) -> int:
+    """
+    Move an archive's rows back into transactions and drop the file
+
+    References to recurring series or documents deleted in the meantime
+    are cleared; restored rows are recorded as inserted in the change feed.
+    Commits; returns the number of restored rows.
+
+    Raises:
+        ValueError: If the file doesn't match the recorded stats
+        ArchiveUnavailableError: If the file can't be read from storage
+    """
+    table = _read(archive)
+    total = round(sum(table.column("amount").to_pylist()), 2)
+    if table.num_rows != archive.row_count or total != round(archive.total_amount, 2):
+        raise ValueError("Archive file does not match its recorded stats")
+
+    records = table.to_pylist()
+    rows = []
+    for record in records:
+        row = {name: _from_file_value(record[name], kind) for name, kind in ARCHIVE_FIELDS}
+        row["organization_id"] = archive.organization_id
+        rows.append(row)
+
+    # Clear dangling references; transfer pairs are linked after the insert
+    series = _existing_ids(db, RecurringSeries.id, {r["recurring_series_id"] for r in rows} - {None})
+    documents = _existing_ids(db, Document.id, {r["source_document_id"] for r in rows} - {None})
+    pairs = {}
+    for row in rows:
+        if row["recurring_series_id"] not in series:
+            row["recurring_series_id"] = None
+        if row["source_document_id"] not in documents:
+            row["source_document_id"] = None
+        if row["transfer_pair_id"] is not None:
+            pairs[row["id"]] = row["transfer_pair_id"]
+        row["transfer_pair_id"] = None
+
+    for chunk in _chunks(rows):
+        db.execute(insert(Transaction), chunk)
+
+    present = _existing_ids(db, Transaction.id, set(pairs.values()))
+    links = [(leg, other) for leg, other in pairs.items() if other in present]
+    if links:
+        # Both directions: hot legs lost their pointer when this was archived
+        transactions = Transaction.__table__
+        db.execute(
+            update(transactions)
+            .where(transactions.c.id == bindparam("leg_id"))
+            .values(transfer_pair_id=bindparam("pair_id"), version=transactions.c.version + 1),
+            [{"leg_id": leg, "pair_id": other} for leg, other in links]
+            + [{"leg_id": other, "pair_id": leg} for leg, other in links]
+        )
+
+    tagged = [(record["id"], record["tags"]) for record in records if record["tags"]]
+    if tagged:
+        tags = get_or_create_tags(db, archive.organization_id, {name for _, names in tagged for name in names})
+        tag_ids = {tag.name: tag.id for tag in tags}
+        db.execute(insert(transaction_tags), [
+            {"transaction_id": uuid.UUID(transaction_id), "tag_id": tag_ids[name]}
+            for transaction_id, names in tagged
+            for name in names
+        ])
+
+    # Clients following the feed see the rows come back
+    for row in rows:
+        record_change(db, archive.organization_id, "transaction", row["id"], "inserted")
+    restored = {row["id"] for row in rows}
+    for transaction_id in sorted({other for _, other in links} - restored, key=str):
+        record_change(db, archive.organization_id, "transaction", transaction_id, "updated")
+
+    db.delete(archive)
+    record_change(db, archive.organization_id, "archive", archive.id, "deleted")
+    db.commit()
+    storage.discard(archive.storage_key)
+    return len(rows)
+
+
+def scan_archives(
+    db: Session,
+    organization_id,
+    ranges: List[Tuple[date, date]],
+    columns: List[str],
+):
+    """
+    Archived rows of an organization dated within any of the ranges, as a
+    pandas DataFrame with the requested columns
+
+    Files are chosen by their recorded min/max dates, memory-mapped, and
+    filtered with Parquet row-group statistics. Returns None when no archive
+    overlaps (without importing pyarrow).
+
+    Raises:
+        ArchiveUnavailableError: If an overlapping file can't be read, rather
+            than returning totals that silently miss archived rows
+    """
+    archives = db.query(TransactionArchive).filter(
+        TransactionArchive.organization_id == organization_id,
+        or_(*[
+            and_(TransactionArchive.min_date <= end, TransactionArchive.max_date >= start)
+            for start, end in ranges
+        ])
+    ).all()
+    if not archives:
+        return None
+
+    filters = [[("date", ">=", start), ("date", "<=", end)] for start, end in ranges]
+    tables = [_read(archive, columns=columns, filters=filters) for archive in archives]
+    return load_module("pyarrow").concat_tables(tables).to_pandas()
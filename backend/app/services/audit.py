@@ -0,0 +1,208 @@
+"""
+Audit trail and classification-history capture for transaction reviews
+
+Rows are appended to an in-memory buffer and bulk-inserted by a background
+thread once AUDIT_FLUSH_SIZE rows are pending or AUDIT_FLUSH_INTERVAL_SECONDS
+have passed, so a review costs no extra round-trips on the request path.
+"""
+import logging
+import threading
+from datetime import date, datetime
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.models import ClassificationHistory, Transaction, TransactionAudit, TransactionStatus
+
+logger = logging.getLogger(__name__)
+
+
+class AuditBuffer:
+    """Append-only write buffer flushed in batches by a background thread"""
+
+    def __init__(self, flush_size: int, flush_interval: float, session_factory=SessionLocal, max_retries: int = 3):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.session_factory = session_factory
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        # table -> [(row, failed attempts so far)]
+        self._pending: Dict[object, List[Tuple[dict, int]]] = {}
+        self._count = 0
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, table, rows: List[dict]) -> None:
+        """Queue rows for bulk insert into table"""
+        self._queue(table, [(row, 0) for row in rows])
+
+    def _queue(self, table, entries: List[Tuple[dict, int]]) -> None:
+        if not entries:
+            return
+        with self._lock:
+            self._pending.setdefault(table, []).extend(entries)
+            self._count += len(entries)
+            full = self._count >= self.flush_size
+        if full:
+            self._wake.set()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._count
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of rows written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._count = 0
+        return sum(self._write(table, entries) for table, entries in pending.items())
+
+    def _insert(self, table, rows: List[dict]) -> bool:
+        db = self.session_factory()
+        try:
+            db.execute(insert(table), rows)
+            db.commit()
+            return True
+        except Exception:
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    def _write(self, table, entries: List[Tuple[dict, int]]) -> int:
+        """
+        Bulk-insert one table's rows; if the batch fails, insert row by row so
+        only the failing rows (e.g. history for a since-deleted transaction)
+        are retried and, after max_retries, dropped
+        """
+        if self._insert(table, [row for row, _ in entries]):
+            return len(entries)
+
+        written = 0
+        retry = []
+        for row, failures in entries:
+            if self._insert(table, [row]):
+                written += 1
+            elif failures + 1 >= self.max_retries:
+                logger.error("Dropping %s row after %d failed writes: %r", table.name, failures + 1, row)
+            else:
+                retry.append((row, failures + 1))
+        if retry:
+            logger.warning("Audit flush into %s failed for %d rows; re-queueing", table.name, len(retry))
+            self._queue(table, retry)
+        return written
+
+    def start(self) -> None:
+        """Start the background flusher (idempotent)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flusher and write whatever is left"""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wake.wait(timeout=self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+audit_buffer = AuditBuffer(
+    flush_size=settings.AUDIT_FLUSH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+)
+
+
+def _audit_value(value) -> Optional[str]:
+    """Render a field value for the audit trail"""
+    if value is None:
+        return None
+    if isinstance(value, Enum):
+        return str(value.value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return ",".join(str(getattr(item, "name", item)) for item in value)
+    return str(value)
+
+
+def diff_values(previous: dict, update_data: dict) -> List[dict]:
+    """
+    Field-level differences between previous values and an update payload
+    Unchanged fields are skipped
+    """
+    changes = []
+    for field, new_value in update_data.items():
+        old = _audit_value(previous.get(field))
+        new = _audit_value(new_value)
+        if old != new:
+            changes.append({"field": field, "old_value": old, "new_value": new})
+    return changes
+
+
+def is_review(update_data: dict) -> bool:
+    """An edit is a review when it sets a category or marks the row REVIEWED"""
+    return "category_id" in update_data or update_data.get("status") == TransactionStatus.REVIEWED
+
+
+@event.listens_for(Session, "after_commit")
+def _buffer_after_commit(session):
+    for table, rows in session.info.pop("audit_rows", {}).items():
+        audit_buffer.add(table, rows)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop("audit_rows", None)
+
+
+def record_review(
+    db: Session,
+    transaction: Transaction,
+    user_id,
+    changes: List[dict],
+    previous_category_id: Optional[UUID],
+    reviewed: bool,
+) -> None:
+    """
+    Queue audit/learning rows for an edit (handed to the buffer when the
+    session commits)
+
+    For reviews of a transaction that had (or now has) a category, the
+    outcome is queued as ClassificationHistory: accepted if the category was
+    kept, overridden otherwise.
+    """
+    staged = db.info.setdefault("audit_rows", {})
+    staged.setdefault(TransactionAudit.__table__, []).extend([
+        {
+            "organization_id": transaction.organization_id,
+            "transaction_id": transaction.id,
+            "user_id": user_id,
+            **change,
+        }
+        for change in changes
+    ])
+
+    if reviewed and (previous_category_id or transaction.category_id):
+        staged.setdefault(ClassificationHistory.__table__, []).append({
+            "transaction_id": transaction.id,
+            "suggested_category_id": previous_category_id,
+            "confidence_score": transaction.confidence_score,
+            "was_accepted": previous_category_id == transaction.category_id,
+            "actual_category_id": transaction.category_id,
+        })
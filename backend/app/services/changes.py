@@ -0,0 +1,144 @@
+"""
+Per-organization change feed
+
+Writes append a ChangeEvent row in the same transaction as the change itself,
+so the log never disagrees with the data. After commit, in-process
+subscribers (open SSE streams) are woken immediately; streams also poll the
+log on an interval to pick up writes made by other worker processes.
+
+Readers page by a per-organization seq rather than the BIGSERIAL id: ids are
+handed out at insert time, so a transaction holding id 10 can commit after
+one holding id 11 and a reader already past 11 would never see 10. seq is
+allocated at flush by incrementing organizations.change_seq, whose row lock
+is held until commit, so an organization's events commit in seq order.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+from app.models.models import ChangeEvent, Organization
+
+
+class ChangeNotifier:
+    """Wakes change-feed subscribers of an organization"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = defaultdict(set)
+
+    def subscribe(self, organization_id) -> asyncio.Event:
+        """Register the calling coroutine; returns an Event set on new changes"""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters[str(organization_id)].add(waiter)
+        return waiter[1]
+
+    def unsubscribe(self, organization_id, wake: asyncio.Event) -> None:
+        key = str(organization_id)
+        with self._lock:
+            self._waiters[key] = {w for w in self._waiters[key] if w[1] is not wake}
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+    def notify(self, organization_id) -> None:
+        """Wake every subscriber of the organization (safe from any thread)"""
+        with self._lock:
+            waiters = list(self._waiters.get(str(organization_id), ()))
+        for loop, wake in waiters:
+            loop.call_soon_threadsafe(wake.set)
+
+
+notifier = ChangeNotifier()
+
+
+def record_change(
+    db: Session,
+    organization_id,
+    entity: str,
+    entity_id,
+    action: str,
+    status: Optional[str] = None
+) -> None:
+    """
+    Append a change to the log as part of the session's current transaction
+
+    Subscribers are notified once the session commits.
+    """
+    change = ChangeEvent(
+        organization_id=organization_id,
+        entity=entity,
+        entity_id=entity_id,
+        action=action,
+        status=status,
+    )
+    db.add(change)
+    db.info.setdefault("pending_changes", []).append(change)
+    db.info.setdefault("changed_organizations", set()).add(str(organization_id))
+
+
+@event.listens_for(Session, "before_flush")
+def _allocate_sequence(session, flush_context, instances):
+    """Number pending changes from their organization's counter (one UPDATE per organization)"""
+    pending = session.info.pop("pending_changes", None)
+    if not pending:
+        return
+    by_organization: Dict[str, List[ChangeEvent]] = defaultdict(list)
+    for change in pending:
+        by_organization[str(change.organization_id)].append(change)
+
+    for changes in by_organization.values():
+        organization_id = changes[0].organization_id
+        last = session.execute(
+            update(Organization)
+            .where(Organization.id == organization_id)
+            .values(change_seq=Organization.change_seq + len(changes))
+            .returning(Organization.change_seq)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if last is None:
+            raise ValueError(f"Unknown organization {organization_id}")
+        for offset, change in enumerate(changes):
+            change.seq = last - len(changes) + offset + 1
+        # Read-your-writes marker for the client (app.db.session.track_writes)
+        session.info.setdefault("change_seqs", {})[str(organization_id)] = last
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_after_commit(session):
+    for organization_id in session.info.pop("changed_organizations", ()):
+        notifier.notify(organization_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop("changed_organizations", None)
+    session.info.pop("pending_changes", None)
+
+
+def serialize_change(change: ChangeEvent) -> dict:
+    return {
+        "id": change.seq,
+        "entity": change.entity,
+        "entity_id": str(change.entity_id),
+        "action": change.action,
+        "status": change.status,
+        "created_at": change.created_at.isoformat() if change.created_at else None,
+    }
+
+
+def get_changes_since(db: Session, organization_id, since_id: int, limit: int) -> List[ChangeEvent]:
+    """Changes with seq greater than since_id, oldest first"""
+    return db.query(ChangeEvent).filter(
+        ChangeEvent.organization_id == organization_id,
+        ChangeEvent.seq > since_id
+    ).order_by(ChangeEvent.seq).limit(limit).all()
+
+
+def get_latest_change_id(db: Session, organization_id) -> int:
+    """Seq of the newest committed change for the organization (0 if none)"""
+    latest = db.query(Organization.change_seq).filter(Organization.id == organization_id).scalar()
+    return latest or 0
@@ -0,0 +1,111 @@
+"""
+Optimistic-concurrency updates for transactions
+
+Each transaction carries a version that is bumped on every write and exposed
+as its ETag. An edit is a single conditional statement:
+
+    WITH previous AS (SELECT ... WHERE id AND org AND version FOR UPDATE)
+    UPDATE transactions SET ..., version = version + 1
+    FROM previous WHERE transactions.id = previous.id
+    RETURNING transactions.*, previous.<old values>
+
+so the caller gets the new row and the values it replaced (for the audit
+trail) in one round-trip. SQLite can't RETURN columns of the FROM clause, so
+there it is a guarded SELECT followed by UPDATE ... RETURNING.
+"""
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.models.models import Transaction
+from app.services.merchants import normalize_merchant
+
+_etag_pattern = re.compile(r'^(?:W/)?"(\d+)"$')
+
+
+def make_etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def parse_etag(value: str) -> Optional[int]:
+    """Version from an If-Match value ('"3"' or 'W/"3"'); None if malformed"""
+    match = _etag_pattern.match(value.strip())
+    return int(match.group(1)) if match else None
+
+
+def conditional_update(
+    db: Session,
+    organization_id,
+    transaction_id,
+    values: dict,
+    expected_version: Optional[int] = None,
+    previous_fields: Iterable[str] = (),
+    extra_columns: Iterable = (),
+) -> Optional[Tuple[Transaction, Dict[str, object], Dict[str, object]]]:
+    """
+    Apply values to a transaction if it exists (and still has expected_version)
+
+    Args:
+        values: Column values/expressions to set; version is bumped automatically
+        expected_version: Required current version, or None to skip the check
+        previous_fields: Columns whose pre-update values should be returned
+        extra_columns: Labeled expressions to return with the updated row
+            (e.g. tag_names_column), saving a follow-up SELECT
+
+    Returns:
+        (updated transaction, {field: previous value}, {label: value}), or
+        None when no row matched (missing, other organization, or version
+        conflict)
+    """
+    previous_fields = list(previous_fields)
+    extra_columns = list(extra_columns)
+    conditions = [
+        Transaction.id == transaction_id,
+        Transaction.organization_id == organization_id,
+    ]
+    if expected_version is not None:
+        conditions.append(Transaction.version == expected_version)
+    values = {**values, "version": Transaction.version + 1}
+    if "merchant" in values:
+        values["merchant_key"] = normalize_merchant(values["merchant"]) or None
+    previous_columns = [getattr(Transaction, field).label(f"previous_{field}") for field in previous_fields]
+
+    if db.bind.dialect.name == "postgresql":
+        previous = select(Transaction.id, *previous_columns).where(*conditions).with_for_update().cte("previous")
+        statement = (
+            update(Transaction)
+            .where(Transaction.id == previous.c.id)
+            .values(values)
+            .returning(Transaction, *[previous.c[f"previous_{field}"] for field in previous_fields], *extra_columns)
+        )
+        row = db.execute(statement, execution_options={"synchronize_session": False}).first()
+        if row is None:
+            return None
+        previous_values = row[1:1 + len(previous_fields)]
+        return row[0], dict(zip(previous_fields, previous_values)), _extras(extra_columns, row[1 + len(previous_fields):])
+
+    # SQLite renders RETURNING columns unqualified, which breaks correlated
+    # extras; read them with the guarded SELECT (the UPDATE doesn't touch them)
+    previous_row = db.execute(select(Transaction.id, *previous_columns, *extra_columns).where(*conditions)).first()
+    if previous_row is None:
+        return None
+    statement = update(Transaction).where(*conditions).values(values).returning(Transaction)
+    row = db.execute(statement, execution_options={"synchronize_session": False}).first()
+    if row is None:
+        return None
+    previous_values = previous_row[1:1 + len(previous_fields)]
+    return row[0], dict(zip(previous_fields, previous_values)), _extras(extra_columns, previous_row[1 + len(previous_fields):])
+
+
+def _extras(columns: list, values) -> Dict[str, object]:
+    return {column.key: value for column, value in zip(columns, values)}
+
+
+def current_version(db: Session, organization_id, transaction_id) -> Optional[int]:
+    """Version of a transaction, or None if it doesn't exist for the organization"""
+    return db.query(Transaction.version).filter(
+        Transaction.id == transaction_id,
+        Transaction.organization_id == organization_id
+    ).scalar()
@@ -0,0 +1,410 @@
+"""
+Resumable statement ingestion
+
+A document is read as a stream of rows, each tagged with the resume position
+reached after it: the data-row index for CSV/Excel, the page index for PDF
+(where only page ends are safe stopping points). Every DOCUMENT_BATCH_SIZE
+rows the new transactions and the document's checkpoint are committed
+together (along with their change-feed events), so a retry resumes from
+the last checkpoint without losing or duplicating rows.
+
+Each run claims the document by bumping its attempts counter, and a batch
+only commits while the document still carries that attempt number. A run
+that was reaped as stale (or superseded by a retry) therefore can't write
+after the next run has started.
+"""
+import logging
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from dateutil import parser as date_parser
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.models import Document, DocumentStatus, Transaction
+from app.services.changes import record_change
+from app.services.loaders import load_parser
+from app.services.recurring import update_recurring_series
+from app.services.storage import storage
+from app.services.transfers import match_transfers
+
+logger = logging.getLogger(__name__)
+
+# Statement column headers (normalized) recognized for each transaction field
+COLUMN_ALIASES = {
+    "date": ("date", "transaction date", "posted date", "posting date", "trans date"),
+    "amount": ("amount", "transaction amount"),
+    "debit": ("debit", "debits", "withdrawal", "withdrawals"),
+    "credit": ("credit", "credits", "deposit", "deposits"),
+    "description": ("description", "memo", "details", "narrative"),
+    "merchant": ("merchant", "payee", "name", "counterparty"),
+}
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+XLS = "application/vnd.ms-excel"
+
+# Leading bytes of each binary format; anything else is read as CSV text.
+# The upload's content type isn't trusted: Windows sends CSV files as
+# application/vnd.ms-excel.
+FILE_SIGNATURES = (
+    (b"%PDF", "application/pdf"),
+    (b"PK\x03\x04", XLSX),  # zip container
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", XLS),  # OLE2 compound file
+)
+
+# (resume position after this row or None if not a safe stop, row or None)
+RowStream = Iterator[Tuple[Optional[int], Optional[dict]]]
+
+
+def _read_csv(path: str, start: int) -> RowStream:
+    csv = load_parser("text/csv")
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        for index, record in enumerate(csv.DictReader(handle)):
+            if index >= start:
+                yield index + 1, record
+
+
+def _read_xlsx(path: str, start: int) -> RowStream:
+    openpyxl = load_parser(XLSX)
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        header = [str(cell or "") for cell in next(sheet.iter_rows(max_row=1, values_only=True), ())]
+        for index, values in enumerate(sheet.iter_rows(min_row=start + 2, values_only=True), start):
+            yield index + 1, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def _read_xls(path: str, start: int) -> RowStream:
+    pandas = load_parser(XLS)
+    frame = pandas.read_excel(path, skiprows=range(1, start + 1), dtype=object, engine="xlrd")
+    frame = frame.astype(object).where(frame.notna(), None)
+    for index, record in enumerate(frame.to_dict("records"), start):
+        yield index + 1, record
+
+
+def _read_pdf(path: str, start: int) -> RowStream:
+    pdfplumber = load_parser("application/pdf")
+    with pdfplumber.open(path) as pdf:
+        for page_index in range(start, len(pdf.pages)):
+            # Statements repeat the table header on every page
+            for table in pdf.pages[page_index].extract_tables():
+                header = [str(cell or "") for cell in table[0]] if table else []
+                if "date" not in map_columns(header):
+                    continue
+                for values in table[1:]:
+                    yield None, dict(zip(header, values))
+            yield page_index + 1, None
+
+
+ROW_READERS = {
+    "text/csv": _read_csv,
+    "application/pdf": _read_pdf,
+    XLS: _read_xls,
+    XLSX: _read_xlsx,
+}
+
+
+def detect_content_type(path: str) -> str:
+    """Content type of a stored statement, from its leading bytes"""
+    with open(path, "rb") as handle:
+        head = handle.read(8)
+    for signature, content_type in FILE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return "text/csv"
+
+
+def map_columns(headers) -> Dict[str, str]:
+    """Transaction field -> source header, for recognizable statement columns"""
+    columns = {}
+    for header in headers:
+        key = " ".join(str(header or "").lower().replace("_", " ").split())
+        for field, aliases in COLUMN_ALIASES.items():
+            if key in aliases and field not in columns:
+                columns[field] = header
+    return columns
+
+
+def parse_amount(value) -> Optional[float]:
+    """Amount from a number or text like '$1,200.00', '(45.10)' or '45.10-'"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return None if value != value else float(value)  # NaN
+    text = str(value).strip().replace("$", "").replace(",", "")
+    negative = text.startswith("(") and text.endswith(")")
+    text = text.strip("()")
+    if text.endswith("-"):
+        negative, text = True, text[:-1]
+    try:
+        amount = float(text)
+    except ValueError:
+        return None
+    return -amount if negative else amount
+
+
+def parse_date(value) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not value:
+        return None
+    try:
+        return date_parser.parse(str(value)).date()
+    except (ValueError, OverflowError):
+        return None
+
+
+def _text(value, max_length: int) -> Optional[str]:
+    text = str(value).strip() if value is not None else ""
+    return text[:max_length] or None
+
+
+def row_values(record: dict, columns: Dict[str, str]) -> Optional[dict]:
+    """Transaction fields for a statement row, or None if it isn't one"""
+    def cell(field):
+        return record.get(columns[field]) if field in columns else None
+
+    day = parse_date(cell("date"))
+    if "amount" in columns:
+        amount = parse_amount(cell("amount"))
+    else:
+        credit, debit = parse_amount(cell("credit")), parse_amount(cell("debit"))
+        amount = None if credit is None and debit is None else (credit or 0) - abs(debit or 0)
+    if day is None or amount is None:
+        return None
+
+    return {
+        "date": day,
+        "amount": amount,
+        "description": _text(cell("description"), 500),
+        "merchant": _text(cell("merchant"), 255),
+    }
+
+
+def _stale_before() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(seconds=settings.DOCUMENT_STALE_AFTER_SECONDS)
+
+
+def _is_stale():
+    return and_(
+        Document.status == DocumentStatus.PROCESSING,
+        or_(Document.checkpoint_at.is_(None), Document.checkpoint_at < _stale_before())
+    )
+
+
+def claim_document(db: Session, organization_id, document_id) -> Optional[int]:
+    """
+    Mark a document PROCESSING for a new run (not committed)
+
+    Pending and failed documents can be claimed, as can PROCESSING ones
+    whose run stopped checkpointing. Completed documents can't.
+
+    Returns:
+        The run's attempt number, or None if the document can't be claimed
+    """
+    return db.execute(
+        update(Document)
+        .where(
+            Document.id == document_id,
+            Document.organization_id == organization_id,
+            or_(Document.status.in_([DocumentStatus.PENDING, DocumentStatus.FAILED]), _is_stale())
+        )
+        .values(
+            status=DocumentStatus.PROCESSING,
+            attempts=Document.attempts + 1,
+            checkpoint_at=func.now(),
+            error_message=None
+        )
+        .returning(Document.attempts)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+
+
+def _owned(document_id, attempt: int):
+    return and_(
+        Document.id == document_id,
+        Document.attempts == attempt,
+        Document.status == DocumentStatus.PROCESSING
+    )
+
+
+def _commit_batch(
+    db: Session,
+    organization_id,
+    document_id,
+    attempt: int,
+    batch: List[Transaction],
+    skipped: int,
+    position: int,
+    finished: bool = False,
+) -> bool:
+    """
+    Insert a batch and advance the checkpoint in one commit
+
+    Returns False (writing nothing) if the run no longer owns the document.
+    """
+    values = {
+        "checkpoint_offset": position,
+        "rows_imported": Document.rows_imported + len(batch),
+        "rows_skipped": Document.rows_skipped + skipped,
+        "checkpoint_at": func.now(),
+    }
+    if finished:
+        values.update(status=DocumentStatus.COMPLETED, processed_at=func.now())
+    # Checkpoint first: it locks the document row for the rest of the batch
+    owned = db.execute(
+        update(Document)
+        .where(_owned(document_id, attempt))
+        .values(values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not owned:
+        db.rollback()
+        logger.warning("Document %s run %d was superseded; stopping", document_id, attempt)
+        return False
+
+    if batch:
+        db.add_all(batch)
+        db.flush()
+        for transaction in batch:
+            record_change(db, organization_id, "transaction", transaction.id, "inserted")
+        match_transfers(db, organization_id, batch)
+        update_recurring_series(db, organization_id, batch)
+    if finished:
+        record_change(db, organization_id, "document", document_id, "status_changed", DocumentStatus.COMPLETED.value)
+    else:
+        record_change(db, organization_id, "document", document_id, "checkpoint", DocumentStatus.PROCESSING.value)
+    db.commit()
+    return True
+
+
+def _import_rows(db: Session, document: Document, attempt: int, rows: RowStream) -> None:
+    organization_id, document_id = document.organization_id, document.id
+    position = document.checkpoint_offset
+    batch: List[Transaction] = []
+    skipped = 0
+    mappings: Dict[tuple, Dict[str, str]] = {}
+
+    for next_position, record in rows:
+        if record is not None:
+            headers = tuple(record)
+            if headers not in mappings:
+                mappings[headers] = map_columns(headers)
+            values = row_values(record, mappings[headers])
+            if values is None:
+                skipped += 1
+            else:
+                batch.append(Transaction(organization_id=organization_id, source_document_id=document_id, **values))
+        if next_position is None:
+            continue
+        position = next_position
+        if len(batch) + skipped >= settings.DOCUMENT_BATCH_SIZE:
+            if not _commit_batch(db, organization_id, document_id, attempt, batch, skipped, position):
+                return
+            batch, skipped = [], 0
+
+    _commit_batch(db, organization_id, document_id, attempt, batch, skipped, position, finished=True)
+
+
+def process_document_rows(document_id, attempt: int, session_factory=SessionLocal) -> None:
+    """
+    Import a claimed document from its checkpoint onward (background task)
+
+    Failures mark the document FAILED; retrying resumes from the checkpoint.
+    """
+    db = session_factory()
+    try:
+        document = db.get(Document, document_id)
+        if document is None or document.attempts != attempt:
+            return
+        organization_id = document.organization_id
+        try:
+            path = storage.path(document.storage_path)
+            reader = ROW_READERS[detect_content_type(path)]
+            _import_rows(db, document, attempt, reader(path, document.checkpoint_offset))
+        except Exception as e:
+            db.rollback()
+            logger.exception("Processing document %s failed", document_id)
+            failed = db.execute(
+                update(Document)
+                .where(_owned(document_id, attempt))
+                .values(status=DocumentStatus.FAILED, error_message=f"{type(e).__name__}: {e}")
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if failed:
+                record_change(db, organization_id, "document", document_id, "status_changed", DocumentStatus.FAILED.value)
+            db.commit()
+    finally:
+        db.close()
+
+
+def reap_stale_documents(db: Session) -> int:
+    """
+    Fail PROCESSING documents whose run stopped checkpointing (crashed or
+    killed worker); processing them again resumes from the checkpoint
+
+    Returns the number of documents reaped.
+    """
+    reaped = db.execute(
+        update(Document)
+        .where(_is_stale())
+        .values(
+            status=DocumentStatus.FAILED,
+            error_message="Processing stalled; retry to resume from the last checkpoint"
+        )
+        .returning(Document.id, Document.organization_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    for document_id, organization_id in reaped:
+        record_change(db, organization_id, "document", document_id, "status_changed", DocumentStatus.FAILED.value)
+    db.commit()
+    return len(reaped)
+
+
+class DocumentReaper:
+    """Background thread running reap_stale_documents on an interval"""
+
+    def __init__(self, interval: float, session_factory=SessionLocal):
+        self.interval = interval
+        self.session_factory = session_factory
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def reap(self) -> int:
+        db = self.session_factory()
+        try:
+            return reap_stale_documents(db)
+        except Exception:
+            db.rollback()
+            logger.exception("Reaping stale documents failed")
+            return 0
+        finally:
+            db.close()
+
+    def start(self) -> None:
+        """Start the reaper (idempotent)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="document-reaper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopping.wait(timeout=self.interval):
+            self.reap()
+
+
+document_reaper = DocumentReaper(settings.DOCUMENT_REAPER_INTERVAL_SECONDS)
@@ -0,0 +1,52 @@
+"""
+Lazy loaders for heavy optional dependencies
+
+Document parsers (pdfplumber, openpyxl, pandas, pytesseract) add seconds to
+process startup, so they are imported on first use instead of at module
+import time.
+"""
+import importlib
+from functools import lru_cache
+from types import ModuleType
+
+# Parser module for each supported upload content type
+PARSER_MODULES = {
+    "text/csv": "csv",
+    "application/pdf": "pdfplumber",
+    "application/vnd.ms-excel": "pandas",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "openpyxl",
+}
+
+# Everything warm_up() may import ahead of forking workers
+HEAVY_MODULES = (
+    "numpy",
+    "pandas",
+    "pyarrow.parquet",
+    "pdfplumber",
+    "PyPDF2",
+    "openpyxl",
+    "xlrd",
+    "pytesseract",
+    "boto3",
+    "app.services.analytics",
+)
+
+
+@lru_cache(maxsize=None)
+def load_module(name: str) -> ModuleType:
+    """Import a module once and cache it"""
+    return importlib.import_module(name)
+
+
+def load_parser(content_type: str) -> ModuleType:
+    """
+    Parser module for a document content type, imported on first use
+
+    Raises:
+        ValueError: If the content type has no parser
+    """
+    try:
+        return load_module(PARSER_MODULES[content_type])
+    except KeyError:
+        raise ValueError(f"No parser for content type {content_type}")
+
@@ -0,0 +1,16 @@
+"""
+Merchant name normalization shared by analytics and recurring detection
+"""
+import re
+
+# Digits/punctuation are mostly store numbers, card suffixes and URLs noise
+MERCHANT_NOISE_PATTERN = r"[^a-z]+"
+
+_noise = re.compile(MERCHANT_NOISE_PATTERN)
+
+
+def normalize_merchant(merchant) -> str:
+    """'NETFLIX.COM 866-579' -> 'netflix com'"""
+    if not merchant:
+        return ""
+    return _noise.sub(" ", merchant.lower()).strip()
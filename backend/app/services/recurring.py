@@ -0,0 +1,357 @@
+"""
+Recurring-transaction (subscription, rent, payroll) detection
+
+Transactions are bucketed by (normalized merchant, direction) in a dict and
+each bucket is split into amount clusters, so a merchant can bill several
+series (e.g. two subscription plans). Each cluster is sorted by date and its
+date intervals are matched against known cadences - O(n log n) overall.
+New transactions are matched against their merchant's existing series (after
+it, or before it for an older statement imported late); those that fit none
+trigger a (bounded, merchant_key-indexed) look-back over unassigned history.
+"""
+import statistics
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.models.models import RecurringSeries, Transaction
+from app.services.changes import record_change
+from app.services.merchants import normalize_merchant
+
+
+@dataclass(frozen=True)
+class Cadence:
+    name: str
+    days: int  # nominal interval
+    slack: int  # allowed deviation in days
+    min_occurrences: int
+    step: relativedelta
+
+
+CADENCES = (
+    Cadence("weekly", 7, 1, 4, relativedelta(weeks=1)),
+    Cadence("biweekly", 14, 2, 3, relativedelta(weeks=2)),
+    Cadence("monthly", 30, 4, 3, relativedelta(months=1)),
+    Cadence("quarterly", 91, 10, 3, relativedelta(months=3)),
+    Cadence("annual", 365, 15, 2, relativedelta(years=1)),
+)
+CADENCES_BY_NAME = {cadence.name: cadence for cadence in CADENCES}
+
+# Amounts within 10% (or $1) of the series' typical amount belong to it
+AMOUNT_TOLERANCE = 0.10
+MIN_AMOUNT_TOLERANCE = 1.0
+# Share of intervals that must match the cadence
+MIN_REGULARITY = 0.75
+# How far back to look for a new merchant's earlier occurrences
+LOOKBACK_DAYS = 400
+
+
+@dataclass
+class LedgerRow:
+    id: object
+    date: date
+    amount: float
+    merchant: Optional[str]
+
+
+@dataclass
+class DetectedSeries:
+    merchant_key: str
+    direction: str
+    cadence: Cadence
+    typical_amount: float
+    members: List[LedgerRow] = field(default_factory=list)
+
+
+def series_key(merchant: Optional[str], amount: float) -> Optional[Tuple[str, str]]:
+    """Bucket key for a transaction, or None if it has no usable merchant"""
+    merchant_key = normalize_merchant(merchant)
+    if not merchant_key or not amount:
+        return None
+    return merchant_key, "inflow" if amount > 0 else "outflow"
+
+
+def amount_tolerance(typical_amount: float) -> float:
+    return max(abs(typical_amount) * AMOUNT_TOLERANCE, MIN_AMOUNT_TOLERANCE)
+
+
+def detect_series(merchant_key: str, direction: str, rows: List[LedgerRow]) -> Optional[DetectedSeries]:
+    """
+    Find a periodic series in one merchant bucket
+
+    Rows far from the median amount (one-off purchases at the same merchant)
+    are ignored; the rest must be spaced at a known cadence.
+    """
+    if len(rows) < 2:
+        return None
+
+    typical = statistics.median(row.amount for row in rows)
+    tolerance = amount_tolerance(typical)
+    members = sorted(
+        (row for row in rows if abs(row.amount - typical) <= tolerance),
+        key=lambda row: row.date
+    )
+    # Same-day duplicates (e.g. split charges) count once for spacing
+    distinct_dates = sorted({row.date for row in members})
+    if len(distinct_dates) < 2:
+        return None
+
+    intervals = [(b - a).days for a, b in zip(distinct_dates, distinct_dates[1:])]
+    median_interval = statistics.median(intervals)
+    for cadence in CADENCES:
+        if abs(median_interval - cadence.days) > cadence.slack:
+            continue
+        regular = sum(1 for interval in intervals if abs(interval - cadence.days) <= cadence.slack)
+        if len(distinct_dates) >= cadence.min_occurrences and regular >= MIN_REGULARITY * len(intervals):
+            return DetectedSeries(
+                merchant_key=merchant_key,
+                direction=direction,
+                cadence=cadence,
+                typical_amount=round(statistics.median(row.amount for row in members), 2),
+                members=members,
+            )
+    return None
+
+
+def amount_clusters(rows: List[LedgerRow]) -> List[List[LedgerRow]]:
+    """Split a merchant bucket where consecutive amounts differ by more than the tolerance"""
+    clusters: List[List[LedgerRow]] = []
+    for row in sorted(rows, key=lambda row: abs(row.amount)):
+        if clusters and abs(row.amount - clusters[-1][-1].amount) <= amount_tolerance(clusters[-1][-1].amount):
+            clusters[-1].append(row)
+        else:
+            clusters.append([row])
+    return clusters
+
+
+def detect_bucket(merchant_key: str, direction: str, rows: List[LedgerRow]) -> List[DetectedSeries]:
+    """Detect a series in each amount cluster of one merchant bucket"""
+    detected = []
+    for cluster in amount_clusters(rows):
+        series = detect_series(merchant_key, direction, cluster)
+        if series:
+            detected.append(series)
+    return detected
+
+
+def detect_all(rows: Iterable[LedgerRow]) -> List[DetectedSeries]:
+    """Group rows by merchant bucket and detect its series"""
+    buckets: Dict[Tuple[str, str], List[LedgerRow]] = defaultdict(list)
+    for row in rows:
+        key = series_key(row.merchant, row.amount)
+        if key:
+            buckets[key].append(row)
+
+    detected = []
+    for (merchant_key, direction), bucket in buckets.items():
+        detected.extend(detect_bucket(merchant_key, direction, bucket))
+    return detected
+
+
+def _save_detected(db: Session, organization_id, detected: List[DetectedSeries]) -> List[RecurringSeries]:
+    """Persist detected series and link their member transactions"""
+    saved = []
+    for found in detected:
+        last = found.members[-1]
+        series = RecurringSeries(
+            organization_id=organization_id,
+            merchant_key=found.merchant_key,
+            merchant=last.merchant,
+            direction=found.direction,
+            cadence=found.cadence.name,
+            typical_amount=found.typical_amount,
+            occurrence_count=len(found.members),
+            first_date=found.members[0].date,
+            last_date=last.date,
+            next_expected_date=last.date + found.cadence.step,
+        )
+        db.add(series)
+        db.flush()
+        db.execute(
+            update(Transaction)
+            .where(Transaction.id.in_([row.id for row in found.members]))
+            .values(recurring_series_id=series.id, version=Transaction.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        saved.append(series)
+    return saved
+
+
+def rebuild_recurring_series(db: Session, organization_id) -> List[RecurringSeries]:
+    """
+    Re-detect every series for an organization from its full history
+    (backfill / repair; normal operation uses update_recurring_series)
+    """
+    db.execute(
+        update(Transaction)
+        .where(Transaction.organization_id == organization_id)
+        .values(recurring_series_id=None, version=Transaction.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.query(RecurringSeries).filter(
+        RecurringSeries.organization_id == organization_id
+    ).delete(synchronize_session=False)
+
+    rows = db.execute(
+        select(Transaction.id, Transaction.date, Transaction.amount, Transaction.merchant)
+        .where(Transaction.organization_id == organization_id, Transaction.is_transfer == False)
+    ).all()
+    return _save_detected(db, organization_id, detect_all(LedgerRow(*row) for row in rows))
+
+
+def _fits_amount(series: RecurringSeries, transaction: Transaction) -> bool:
+    return abs(transaction.amount - series.typical_amount) <= amount_tolerance(series.typical_amount)
+
+
+def _add_member(series: RecurringSeries, transaction: Transaction) -> None:
+    transaction.recurring_series_id = series.id
+    series.typical_amount = round(
+        (series.typical_amount * series.occurrence_count + transaction.amount) / (series.occurrence_count + 1), 2
+    )
+    series.occurrence_count += 1
+
+
+def _extend_series(series: RecurringSeries, transaction: Transaction) -> bool:
+    """Attach transaction to series if it fits the amount and expected date"""
+    cadence = CADENCES_BY_NAME[series.cadence]
+    if not _fits_amount(series, transaction):
+        return False
+
+    # Accept the expected occurrence or a later one after missed periods
+    expected = series.next_expected_date
+    while expected + timedelta(days=cadence.slack) < transaction.date:
+        expected = expected + cadence.step
+    if abs((transaction.date - expected).days) > cadence.slack:
+        return False
+
+    _add_member(series, transaction)
+    if transaction.date > series.last_date:
+        series.last_date = transaction.date
+        series.merchant = transaction.merchant
+        series.next_expected_date = transaction.date + cadence.step
+    return True
+
+
+def _prepend_series(series: RecurringSeries, transaction: Transaction) -> bool:
+    """
+    Attach a transaction dated before the series' first occurrence (an older
+    statement imported after a newer one) if it fits a period before it
+    """
+    cadence = CADENCES_BY_NAME[series.cadence]
+    if transaction.date >= series.first_date or not _fits_amount(series, transaction):
+        return False
+
+    expected = series.first_date - cadence.step
+    while expected - timedelta(days=cadence.slack) > transaction.date:
+        expected = expected - cadence.step
+    if abs((transaction.date - expected).days) > cadence.slack:
+        return False
+
+    _add_member(series, transaction)
+    series.first_date = transaction.date
+    return True
+
+
+def update_recurring_series(db: Session, organization_id, transactions: List[Transaction]) -> None:
+    """
+    Incrementally fold newly inserted transactions into recurring series
+
+    Call after the transactions are added to the session (before commit).
+    Earlier rows linked to a newly detected series are recorded as updated
+    in the change feed.
+    """
+    buckets: Dict[Tuple[str, str], List[Transaction]] = defaultdict(list)
+    for transaction in sorted(transactions, key=lambda t: t.date):
+        key = series_key(transaction.merchant, transaction.amount)
+        if key and not transaction.is_transfer and transaction.recurring_series_id is None:
+            buckets[key].append(transaction)
+    if not buckets:
+        return
+
+    existing: Dict[Tuple[str, str], List[RecurringSeries]] = defaultdict(list)
+    for series in db.query(RecurringSeries).filter(
+        RecurringSeries.organization_id == organization_id,
+        RecurringSeries.merchant_key.in_({merchant_key for merchant_key, _ in buckets})
+    ):
+        existing[series.merchant_key, series.direction].append(series)
+
+    def candidates(key, transaction):
+        # Closest typical amount first
+        return sorted(existing[key], key=lambda series: abs(series.typical_amount - transaction.amount))
+
+    unmatched: Dict[Tuple[str, str], List[Transaction]] = {}
+    for key, bucket in buckets.items():
+        leftovers = [
+            transaction for transaction in bucket
+            if not any(_extend_series(series, transaction) for series in candidates(key, transaction))
+        ]
+        # Rows older than a series are walked newest first, so each one
+        # extends the series' start for the next
+        leftovers = [
+            transaction for transaction in reversed(leftovers)
+            if not any(_prepend_series(series, transaction) for series in candidates(key, transaction))
+        ][::-1]
+        if leftovers:
+            unmatched[key] = leftovers
+    if not unmatched:
+        return
+
+    # Unmatched rows: one bounded query for their merchants' unassigned
+    # history, then detect new series
+    db.flush()
+    since = min(t.date for bucket in unmatched.values() for t in bucket) - timedelta(days=LOOKBACK_DAYS)
+    new_ids = {t.id for bucket in unmatched.values() for t in bucket}
+    history: Dict[Tuple[str, str], List[LedgerRow]] = defaultdict(list)
+    for row in db.execute(
+        select(Transaction.id, Transaction.date, Transaction.amount, Transaction.merchant).where(
+            Transaction.organization_id == organization_id,
+            Transaction.merchant_key.in_({merchant_key for merchant_key, _ in unmatched}),
+            Transaction.date >= since,
+            Transaction.recurring_series_id.is_(None),
+            Transaction.is_transfer == False
+        )
+    ):
+        key = series_key(row.merchant, row.amount)
+        if key in unmatched and row.id not in new_ids:
+            history[key].append(LedgerRow(*row))
+
+    detected = []
+    for key, bucket in unmatched.items():
+        rows = history[key] + [LedgerRow(t.id, t.date, t.amount, t.merchant) for t in bucket]
+        detected.extend(detect_bucket(key[0], key[1], rows))
+
+    # Members were linked with a bulk UPDATE; mirror it on the loaded objects
+    # without marking them dirty (which would issue a second UPDATE)
+    linked = {}
+    for found, series in zip(detected, _save_detected(db, organization_id, detected)):
+        linked.update((row.id, series.id) for row in found.members)
+    for transaction_id in sorted(linked.keys() - new_ids, key=str):
+        record_change(db, organization_id, "transaction", transaction_id, "updated")
+    for bucket in unmatched.values():
+        for transaction in bucket:
+            if transaction.id in linked:
+                set_committed_value(transaction, "recurring_series_id", linked[transaction.id])
+
+
+def project_occurrences(series: RecurringSeries, start: date, end: date) -> List[date]:
+    """Expected dates of a series between start and end (inclusive)"""
+    cadence = CADENCES_BY_NAME[series.cadence]
+    occurrences = []
+    expected = series.next_expected_date
+    while expected <= end:
+        if expected >= start:
+            occurrences.append(expected)
+        expected = expected + cadence.step
+    return occurrences
+
+
+def is_active(series: RecurringSeries, as_of: date) -> bool:
+    """A series is stale once two expected occurrences have been missed"""
+    cadence = CADENCES_BY_NAME[series.cadence]
+    return series.next_expected_date + cadence.step + timedelta(days=cadence.slack) >= as_of
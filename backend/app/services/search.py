@@ -0,0 +1,222 @@
+"""
+Full-text and fuzzy search over transactions
+
+Postgres uses a GIN index on a tsvector expression plus a pg_trgm index on
+merchant for fuzzy matches. SQLite (local/testing) uses an FTS5 virtual
+table kept in sync with triggers.
+"""
+import base64
+import json
+import re
+from datetime import date
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import Double, and_, cast, column, func, literal_column, or_, table, text
+from sqlalchemy.orm import Session, selectinload
+
+from app.models.models import Transaction, TransactionStatus
+
+# Must stay identical to the expression indexed in setup.sql so the planner
+# can use idx_transactions_search
+SEARCH_VECTOR_SQL = (
+    "to_tsvector('english', coalesce(transactions.description, '') || ' ' || "
+    "coalesce(transactions.merchant, '') || ' ' || coalesce(transactions.notes, ''))"
+)
+
+POSTGRES_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS idx_transactions_search ON transactions USING GIN ({SEARCH_VECTOR_SQL})",
+    "CREATE INDEX IF NOT EXISTS idx_transactions_merchant_trgm ON transactions USING GIN (merchant gin_trgm_ops)",
+]
+
+SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+        description, merchant, notes,
+        content='transactions', content_rowid='rowid'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_ai AFTER INSERT ON transactions BEGIN
+        INSERT INTO transactions_fts(rowid, description, merchant, notes)
+        VALUES (new.rowid, new.description, new.merchant, new.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_ad AFTER DELETE ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, description, merchant, notes)
+        VALUES ('delete', old.rowid, old.description, old.merchant, old.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_au AFTER UPDATE ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, description, merchant, notes)
+        VALUES ('delete', old.rowid, old.description, old.merchant, old.notes);
+        INSERT INTO transactions_fts(rowid, description, merchant, notes)
+        VALUES (new.rowid, new.description, new.merchant, new.notes);
+    END
+    """,
+    "INSERT INTO transactions_fts(transactions_fts) VALUES ('rebuild')",
+]
+
+_fts_table = table("transactions_fts", column("rowid"))
+
+
+class InvalidCursor(ValueError):
+    """Raised when a search paging cursor cannot be decoded"""
+
+
+def create_search_index(bind) -> None:
+    """
+    Create the search indexes for the connected database
+
+    Safe to run repeatedly; every statement is IF NOT EXISTS.
+    """
+    dialect = bind.dialect.name
+    if dialect == "postgresql":
+        statements = POSTGRES_SEARCH_DDL
+    elif dialect == "sqlite":
+        statements = SQLITE_SEARCH_DDL
+    else:
+        return
+
+    with bind.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+
+
+def encode_cursor(rank: float, sort_value, transaction_id: UUID) -> str:
+    """Encode the last row of a page as an opaque keyset cursor"""
+    if isinstance(sort_value, date):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([rank, sort_value, str(transaction_id)])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: str = "relevance") -> Tuple[float, Optional[date], UUID]:
+    """Decode a cursor produced by encode_cursor, parsing the date for date sort"""
+    try:
+        rank, sort_value, transaction_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort == "date":
+            if not isinstance(sort_value, str):
+                raise TypeError(f"expected an ISO date, got {type(sort_value).__name__}")
+            sort_value = date.fromisoformat(sort_value)
+        return float(rank), sort_value, UUID(transaction_id)
+    except (ValueError, TypeError, AttributeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {str(e)}")
+
+
+def _fts5_query(q: str) -> str:
+    """Turn free text into a safe FTS5 prefix query ("tok"* "tok"*)"""
+    tokens = re.findall(r"\w+", q)
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def search_transactions(
+    db: Session,
+    organization_id,
+    q: str,
+    sort: str = "relevance",
+    status: Optional[TransactionStatus] = None,
+    category_id: Optional[UUID] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Tuple[Transaction, float]], Optional[str]]:
+    """
+    Search an organization's transactions by description, merchant and notes
+
+    Args:
+        db: Database session
+        organization_id: Organization to search within
+        q: Free-text query
+        sort: "relevance" (rank, then id) or "date" (newest first, then id)
+        limit: Page size
+        cursor: Cursor returned with the previous page
+
+    Returns:
+        Tuple of ([(transaction, rank), ...], next_cursor)
+
+    Raises:
+        InvalidCursor: If the cursor cannot be decoded
+    """
+    dialect = db.bind.dialect.name
+    query = db.query(Transaction).options(selectinload(Transaction.tags))
+
+    if dialect == "postgresql":
+        vector = literal_column(SEARCH_VECTOR_SQL)
+        ts_query = func.websearch_to_tsquery("english", q)
+        # `merchant % q` uses the trigram index (pg_trgm.similarity_threshold)
+        merchant = func.coalesce(Transaction.merchant, "")
+        # ts_rank_cd/similarity return real; as double precision the rank
+        # round-trips exactly through the cursor, so ties compare equal
+        rank = cast(func.ts_rank_cd(vector, ts_query) + func.similarity(merchant, q), Double).label("rank")
+        query = query.add_columns(rank).filter(
+            or_(vector.op("@@")(ts_query), Transaction.merchant.bool_op("%")(q))
+        )
+    elif dialect == "sqlite":
+        match = _fts5_query(q)
+        if not match:
+            return [], None
+        rank = literal_column("-bm25(transactions_fts)").label("rank")
+        query = query.add_columns(rank).join(
+            _fts_table, _fts_table.c.rowid == literal_column("transactions.rowid")
+        ).filter(text("transactions_fts MATCH :fts_query").bindparams(fts_query=match))
+    else:
+        pattern = f"%{q}%"
+        rank = literal_column("0.0").label("rank")
+        query = query.add_columns(rank).filter(
+            or_(
+                Transaction.description.ilike(pattern),
+                Transaction.merchant.ilike(pattern),
+                Transaction.notes.ilike(pattern),
+            )
+        )
+
+    query = query.filter(Transaction.organization_id == organization_id)
+    if status:
+        query = query.filter(Transaction.status == status)
+    if category_id:
+        query = query.filter(Transaction.category_id == category_id)
+    if start_date:
+        query = query.filter(Transaction.date >= start_date)
+    if end_date:
+        query = query.filter(Transaction.date <= end_date)
+    if min_amount is not None:
+        query = query.filter(Transaction.amount >= min_amount)
+    if max_amount is not None:
+        query = query.filter(Transaction.amount <= max_amount)
+
+    rank_expr = rank.element
+    if cursor:
+        last_rank, last_date, last_id = decode_cursor(cursor, sort)
+        if sort == "date":
+            query = query.filter(or_(
+                Transaction.date < last_date,
+                and_(Transaction.date == last_date, Transaction.id > last_id),
+            ))
+        else:
+            query = query.filter(or_(
+                rank_expr < last_rank,
+                and_(rank_expr == last_rank, Transaction.id > last_id),
+            ))
+
+    if sort == "date":
+        query = query.order_by(Transaction.date.desc(), Transaction.id)
+    else:
+        query = query.order_by(rank_expr.desc(), Transaction.id)
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.limit(limit + 1).all()
+    results = [(transaction, float(row_rank or 0)) for transaction, row_rank in rows[:limit]]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last, last_rank = results[-1]
+        next_cursor = encode_cursor(last_rank, last.date, last.id)
+
+    return results, next_cursor
@@ -0,0 +1,186 @@
+"""
+File storage for uploaded documents and transaction archives
+
+Files are addressed by key. LocalStorage keeps them under STORAGE_DIR, which
+only works with a single instance or a shared volume. ObjectStorage keeps
+them in an S3-compatible bucket (AWS S3 or Supabase Storage), so any
+instance can read what another wrote, and downloads them into STORAGE_DIR
+on first read so readers can memory-map them. The cache can be cleared at
+any time.
+"""
+import logging
+import os
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from app.core.config import settings
+from app.services.loaders import load_module
+
+logger = logging.getLogger(__name__)
+
+# S3 error codes for a missing object
+MISSING_OBJECT_CODES = {"404", "NoSuchKey", "NotFound"}
+
+
+class StorageUnavailableError(OSError):
+    """The storage service couldn't be reached or refused the request"""
+
+
+class LocalStorage:
+    """Key -> file under a root directory"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _file(self, key: str) -> str:
+        """
+        Local filesystem path of a key
+
+        Raises:
+            ValueError: If the key escapes the storage root
+        """
+        path = os.path.abspath(os.path.join(self.root, key))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"Invalid storage key {key}")
+        return path
+
+    def path(self, key: str) -> str:
+        """
+        Local path of a stored file, for reading or memory-mapping
+
+        Raises:
+            FileNotFoundError: If nothing is stored under the key
+        """
+        path = self._file(key)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No stored file {key}")
+        return path
+
+    @contextmanager
+    def writing(self, key: str) -> Iterator[str]:
+        """
+        Yield a temporary path to write to; it replaces the key atomically
+        once the block exits without error
+        """
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.tmp-{uuid.uuid4().hex}"
+        try:
+            yield temporary
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    def write_bytes(self, key: str, content: bytes) -> None:
+        with self.writing(key) as path:
+            with open(path, "wb") as handle:
+                handle.write(content)
+
+    def size(self, key: str) -> int:
+        return os.path.getsize(self.path(key))
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            pass
+
+    def discard(self, key: str) -> None:
+        """
+        Delete a key once the row that referenced it is committed away;
+        a failure is logged (the file is orphaned) rather than raised
+        """
+        try:
+            self.delete(key)
+        except Exception:
+            logger.exception("Could not delete stored file %s; it is orphaned", key)
+
+
+class ObjectStorage(LocalStorage):
+    """S3-compatible bucket with a local read cache under cache_dir"""
+
+    def __init__(
+        self,
+        bucket: str,
+        cache_dir: str,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+    ):
+        super().__init__(cache_dir)
+        self.bucket = bucket
+        self._client_options = {
+            "endpoint_url": endpoint_url or None,
+            "region_name": region or None,
+            "aws_access_key_id": access_key_id or None,
+            "aws_secret_access_key": secret_access_key or None,
+        }
+        self._client = None
+
+    @property
+    def client(self):
+        """boto3 S3 client, created on first use"""
+        if self._client is None:
+            self._client = load_module("boto3").client("s3", **self._client_options)
+        return self._client
+
+    def path(self, key: str) -> str:
+        """
+        Local cached copy of an object, downloaded on first read
+
+        Raises:
+            FileNotFoundError: If the bucket has no such object
+            StorageUnavailableError: If the download fails for another reason
+                (timeout, credentials, 5xx)
+        """
+        path = self._file(key)
+        if os.path.exists(path):
+            return path
+        with super().writing(key) as temporary:
+            try:
+                self.client.download_file(self.bucket, key, temporary)
+            except OSError:
+                raise
+            except Exception as e:
+                # botocore's BotoCoreError/ClientError and boto3's transfer
+                # errors share no narrower base class
+                code = str(getattr(e, "response", {}).get("Error", {}).get("Code", ""))
+                if code in MISSING_OBJECT_CODES:
+                    raise FileNotFoundError(f"No stored file {key}") from e
+                raise StorageUnavailableError(f"Could not download {key}: {e}") from e
+        return path
+
+    @contextmanager
+    def writing(self, key: str) -> Iterator[str]:
+        """Like LocalStorage.writing; the file is uploaded before it is cached"""
+        with super().writing(key) as temporary:
+            yield temporary
+            self.client.upload_file(temporary, self.bucket, key)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+        super().delete(key)
+
+
+def create_storage():
+    """Storage backend selected by STORAGE_BACKEND"""
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorage(settings.STORAGE_DIR)
+    if settings.STORAGE_BACKEND == "s3":
+        if not settings.AWS_BUCKET_NAME:
+            raise ValueError("STORAGE_BACKEND=s3 requires AWS_BUCKET_NAME")
+        return ObjectStorage(
+            settings.AWS_BUCKET_NAME,
+            settings.STORAGE_DIR,
+            endpoint_url=settings.STORAGE_ENDPOINT_URL,
+            region=settings.AWS_REGION,
+            access_key_id=settings.AWS_ACCESS_KEY_ID,
+            secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        )
+    raise ValueError(f"Unknown STORAGE_BACKEND {settings.STORAGE_BACKEND}")
+
+
+storage = create_storage()
@@ -0,0 +1,131 @@
+"""
+Tag normalization and lookup helpers
+"""
+import uuid
+from typing import Iterable, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models.models import Tag, Transaction, transaction_tags
+
+MAX_TAG_LENGTH = 100
+# Joins aggregated tag names; normalized names never contain it
+TAG_SEPARATOR = "\x1f"
+
+# Dialects whose INSERT supports ON CONFLICT DO NOTHING
+INSERT_BY_DIALECT = {
+    "postgresql": postgresql_insert,
+    "sqlite": sqlite_insert,
+}
+
+
+def normalize_tag_names(names: Optional[Iterable[str]]) -> List[str]:
+    """
+    Trim, lowercase and de-duplicate tag names (keeping first-seen order)
+    Accepts a list or a legacy comma-separated string
+    """
+    if not names:
+        return []
+    if isinstance(names, str):
+        names = names.split(",")
+
+    normalized = []
+    for name in names:
+        name = name.strip().lower()[:MAX_TAG_LENGTH]
+        if name and name not in normalized:
+            normalized.append(name)
+    return normalized
+
+
+def get_or_create_tags(db: Session, organization_id, names: Iterable[str]) -> List[Tag]:
+    """
+    Resolve tag names to Tag rows for an organization, creating missing ones
+
+    Missing tags are inserted with ON CONFLICT DO NOTHING and then selected,
+    so concurrent requests adding the same new tag both succeed.
+    """
+    names = normalize_tag_names(names)
+    if not names:
+        return []
+
+    dialect = db.bind.dialect.name
+    if dialect in INSERT_BY_DIALECT:
+        db.execute(
+            INSERT_BY_DIALECT[dialect](Tag)
+            .values([{"id": uuid.uuid4(), "organization_id": organization_id, "name": name} for name in names])
+            .on_conflict_do_nothing(index_elements=["organization_id", "name"])
+        )
+
+    existing = {
+        tag.name: tag
+        for tag in db.query(Tag).filter(
+            Tag.organization_id == organization_id,
+            Tag.name.in_(names)
+        )
+    }
+    for name in names:
+        if name not in existing:
+            existing[name] = Tag(organization_id=organization_id, name=name)
+            db.add(existing[name])
+
+    return [existing[name] for name in names]
+
+
+def tag_names_column(db: Session):
+    """
+    Correlated subquery of a transaction's tag names joined by TAG_SEPARATOR,
+    for selecting (or RETURNING) them with the transaction row
+    """
+    if db.bind.dialect.name == "postgresql":
+        names = func.string_agg(Tag.name, TAG_SEPARATOR)
+    else:
+        names = func.group_concat(Tag.name, TAG_SEPARATOR)
+    return (
+        select(names)
+        .join(transaction_tags, transaction_tags.c.tag_id == Tag.id)
+        .where(transaction_tags.c.transaction_id == Transaction.id)
+        .correlate(Transaction)
+        .scalar_subquery()
+        .label("tag_names")
+    )
+
+
+def split_tag_names(value: Optional[str]) -> List[str]:
+    """Tag names from tag_names_column(), sorted"""
+    return sorted(value.split(TAG_SEPARATOR)) if value else []
+
+
+def set_transaction_tags(db: Session, transaction: Transaction, names: Iterable[str]) -> None:
+    """Replace a transaction's tags"""
+    transaction.tags = get_or_create_tags(db, transaction.organization_id, names)
+
+
+def filter_by_tags(query, organization_id, names: Iterable[str], match: str = "any"):
+    """
+    Restrict a Transaction query to rows carrying the given tags
+
+    Args:
+        query: Query over Transaction
+        organization_id: Organization the tags belong to
+        names: Tag names to filter on
+        match: "any" (at least one tag) or "all" (every tag)
+    """
+    names = normalize_tag_names(names)
+    if not names:
+        return query
+
+    tagged = (
+        select(transaction_tags.c.transaction_id)
+        .join(Tag, Tag.id == transaction_tags.c.tag_id)
+        .where(Tag.organization_id == organization_id, Tag.name.in_(names))
+    )
+    if match == "all":
+        tagged = tagged.group_by(transaction_tags.c.transaction_id).having(
+            func.count(transaction_tags.c.tag_id) == len(names)
+        )
+
+    return query.filter(Transaction.id.in_(tagged))
+
@@ -0,0 +1,209 @@
+"""
+Transfer and owner-draw matching at import time
+
+A transfer shows up twice: money leaving one account and the same amount
+arriving in another within a few days. New rows are matched against an
+index of unmatched history keyed by amount in cents (hash lookup on the
+opposite amount) with each bucket sorted by date (bisect for the window),
+so a batch of N rows costs O(N log M) instead of N x M comparisons.
+
+The data model has no account entity yet, so the source document (one
+statement per account) stands in for the account: both sides of a pair must
+come from different documents. Manually entered rows have no document, and
+so no known account, and are never paired.
+"""
+import bisect
+import re
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Numeric, bindparam, select, type_coerce, update
+from sqlalchemy.orm import Session
+
+from app.models.models import Transaction
+from app.services.changes import record_change
+
+# Both legs of a transfer must post within this many days of each other
+MATCH_WINDOW_DAYS = 3
+
+OWNER_DRAW_PATTERN = re.compile(r"\b(owner'?s? draw|draw|distribution|shareholder)\b", re.IGNORECASE)
+
+
+class _Candidate:
+    __slots__ = ("id", "date", "document_id", "transaction", "matched")
+
+    def __init__(self, id, date, document_id, transaction: Optional[Transaction] = None):
+        self.id = id
+        self.date = date
+        self.document_id = document_id
+        self.transaction = transaction
+        self.matched = False
+
+
+class TransferIndex:
+    """Unmatched transactions keyed by amount (cents), each bucket sorted by date"""
+
+    def __init__(self):
+        self._buckets: Dict[int, List[Tuple[date, int, _Candidate]]] = defaultdict(list)
+        self._sequence = 0
+
+    @staticmethod
+    def cents(amount: float) -> int:
+        return int(round(amount * 100))
+
+    def add(self, amount: float, candidate: _Candidate) -> None:
+        self._sequence += 1
+        bisect.insort(self._buckets[self.cents(amount)], (candidate.date, self._sequence, candidate))
+
+    def find_offset(self, amount: float, on: date, document_id) -> Optional[_Candidate]:
+        """Closest-dated unmatched row with the opposite amount from another account"""
+        if document_id is None:
+            return None
+        bucket = self._buckets.get(-self.cents(amount))
+        if not bucket:
+            return None
+
+        window = timedelta(days=MATCH_WINDOW_DAYS)
+        lo = bisect.bisect_left(bucket, (on - window,))
+        hi = bisect.bisect_right(bucket, (on + window, float("inf")))
+        best = None
+        for candidate_date, _, candidate in bucket[lo:hi]:
+            if candidate.matched:
+                continue
+            if candidate.document_id is None or candidate.document_id == document_id:
+                continue
+            if best is None or abs((candidate_date - on).days) < abs((best.date - on).days):
+                best = candidate
+        return best
+
+
+def match_transfers(db: Session, organization_id, transactions: List[Transaction]) -> int:
+    """
+    Pair new transactions with offsetting ones and flag owner draws
+
+    Both legs of a pair get is_transfer=True and point at each other via
+    transfer_pair_id. Unpaired outflows whose description/merchant reads like
+    an owner draw get is_owner_draw=True. Everything is written through the
+    caller's session, so it commits atomically with the import; previously
+    stored legs that get paired are recorded as updated in the change feed
+    (the caller records the new rows).
+
+    Returns:
+        Number of pairs matched
+    """
+    new = [
+        t for t in transactions
+        if t.amount and not t.is_transfer and not t.is_owner_draw and t.transfer_pair_id is None
+    ]
+    if not new:
+        return 0
+
+    db.flush()  # new rows need ids
+    new_ids = {t.id for t in new}
+    window = timedelta(days=MATCH_WINDOW_DAYS)
+    start = min(t.date for t in new) - window
+    end = max(t.date for t in new) + window
+    amounts = {-TransferIndex.cents(t.amount) for t in new if t.source_document_id is not None}
+
+    index = TransferIndex()
+    if amounts:
+        # Numeric literals (not floats) so Postgres can use idx_transactions_org_date_amount
+        history = db.execute(
+            select(Transaction.id, Transaction.date, Transaction.amount, Transaction.source_document_id).where(
+                Transaction.organization_id == organization_id,
+                Transaction.date >= start,
+                Transaction.date <= end,
+                type_coerce(Transaction.amount, Numeric(10, 2)).in_([Decimal(cents) / 100 for cents in sorted(amounts)]),
+                Transaction.is_transfer == False,
+                Transaction.is_owner_draw == False,
+                Transaction.transfer_pair_id.is_(None),
+                Transaction.source_document_id.isnot(None)
+            )
+        )
+        for row in history:
+            if row.id not in new_ids:
+                index.add(row.amount, _Candidate(row.id, row.date, row.source_document_id))
+
+    candidates = []
+    for transaction in sorted(new, key=lambda t: t.date):
+        candidate = _Candidate(transaction.id, transaction.date, transaction.source_document_id, transaction)
+        candidates.append(candidate)
+        index.add(transaction.amount, candidate)
+
+    history_updates = []
+    pairs = 0
+    for candidate in candidates:
+        if candidate.matched:
+            continue
+        transaction = candidate.transaction
+        other = index.find_offset(transaction.amount, transaction.date, transaction.source_document_id)
+        if other is None:
+            continue
+
+        candidate.matched = other.matched = True
+        pairs += 1
+        transaction.is_transfer = True
+        transaction.transfer_pair_id = other.id
+        if other.transaction is not None:
+            other.transaction.is_transfer = True
+            other.transaction.transfer_pair_id = transaction.id
+        else:
+            history_updates.append({"leg_id": other.id, "pair_id": transaction.id})
+
+    if history_updates:
+        # One executemany; bump version so open editors see the change (ETag)
+        db.execute(
+            update(Transaction.__table__)
+            .where(Transaction.__table__.c.id == bindparam("leg_id"))
+            .values(
+                is_transfer=True,
+                transfer_pair_id=bindparam("pair_id"),
+                version=Transaction.__table__.c.version + 1
+            ),
+            history_updates
+        )
+        for leg in history_updates:
+            record_change(db, organization_id, "transaction", leg["leg_id"], "updated")
+
+    for candidate in candidates:
+        transaction = candidate.transaction
+        if not candidate.matched and transaction.amount < 0:
+            text = f"{transaction.description or ''} {transaction.merchant or ''}"
+            if OWNER_DRAW_PATTERN.search(text):
+                transaction.is_owner_draw = True
+
+    return pairs
+
+
+def unpair_transfers(db: Session, organization_id, transaction_ids) -> List:
+    """
+    Clear the transfer flag on the surviving legs of pairs whose other leg
+    is about to be deleted
+
+    Call before the rows are deleted (the FK would null transfer_pair_id and
+    lose the link). A surviving leg counts as income/expense again; it gets a
+    version bump and is recorded as updated in the change feed.
+
+    Returns:
+        Ids of the un-flagged legs
+    """
+    transaction_ids = list(transaction_ids)
+    if not transaction_ids:
+        return []
+
+    partner_ids = db.execute(
+        update(Transaction)
+        .where(
+            Transaction.organization_id == organization_id,
+            Transaction.transfer_pair_id.in_(transaction_ids),
+            Transaction.id.notin_(transaction_ids)
+        )
+        .values(is_transfer=False, transfer_pair_id=None, version=Transaction.version + 1)
+        .returning(Transaction.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    for partner_id in partner_ids:
+        record_change(db, organization_id, "transaction", partner_id, "updated")
+    return partner_ids
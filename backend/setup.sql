@@ -8,6 +8,7 @@ CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 CREATE TABLE IF NOT EXISTS organizations (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
     name VARCHAR(255) NOT NULL,
+    change_seq BIGINT NOT NULL DEFAULT 0,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE
 );
@@ -34,9 +35,21 @@ CREATE TABLE IF NOT EXISTS documents (
     status VARCHAR(50) DEFAULT 'pending',
     error_message TEXT,
     uploaded_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    processed_at TIMESTAMP WITH TIME ZONE
+    processed_at TIMESTAMP WITH TIME ZONE,
+    checkpoint_offset INTEGER NOT NULL DEFAULT 0,
+    rows_imported INTEGER NOT NULL DEFAULT 0,
+    rows_skipped INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    checkpoint_at TIMESTAMP WITH TIME ZONE
 );
 
+-- Resumable document processing (existing databases)
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS checkpoint_offset INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS rows_imported INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS rows_skipped INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS checkpoint_at TIMESTAMP WITH TIME ZONE;
+
 -- Categories (Chart of Accounts)
 CREATE TABLE IF NOT EXISTS categories (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -53,29 +66,121 @@ CREATE TABLE IF NOT EXISTS categories (
 CREATE TABLE IF NOT EXISTS transactions (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
     organization_id UUID REFERENCES organizations(id) NOT NULL,
-    source_document_id UUID REFERENCES documents(id),
+    source_document_id UUID REFERENCES documents(id) ON DELETE SET NULL,
     date DATE NOT NULL,
     amount NUMERIC(10, 2) NOT NULL,
     description VARCHAR(500),
     merchant VARCHAR(255),
+    merchant_key VARCHAR(255),
     category_id UUID REFERENCES categories(id),
     confidence_score NUMERIC(3, 2),
     status VARCHAR(50) DEFAULT 'pending',
     reviewed_by UUID REFERENCES users(id),
     reviewed_at TIMESTAMP WITH TIME ZONE,
     notes TEXT,
-    tags VARCHAR(500),
     is_transfer BOOLEAN DEFAULT FALSE,
     is_owner_draw BOOLEAN DEFAULT FALSE,
     payment_method VARCHAR(50),
+    recurring_series_id UUID,
+    transfer_pair_id UUID REFERENCES transactions(id) ON DELETE SET NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Tags (normalized; replaces the old comma-separated transactions.tags)
+CREATE TABLE IF NOT EXISTS tags (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    organization_id UUID REFERENCES organizations(id) NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    CONSTRAINT uq_tags_org_name UNIQUE (organization_id, name)
+);
+
+CREATE TABLE IF NOT EXISTS transaction_tags (
+    transaction_id UUID REFERENCES transactions(id) ON DELETE CASCADE,
+    tag_id UUID REFERENCES tags(id) ON DELETE CASCADE,
+    PRIMARY KEY (transaction_id, tag_id)
+);
+
+-- Migrate legacy comma-separated tags, then drop the old column
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'transactions' AND column_name = 'tags'
+    ) THEN
+        INSERT INTO tags (organization_id, name)
+        SELECT DISTINCT t.organization_id, lower(trim(tag_name))
+        FROM transactions t, unnest(string_to_array(t.tags, ',')) AS tag_name
+        WHERE trim(tag_name) <> ''
+        ON CONFLICT (organization_id, name) DO NOTHING;
+
+        INSERT INTO transaction_tags (transaction_id, tag_id)
+        SELECT DISTINCT t.id, g.id
+        FROM transactions t, unnest(string_to_array(t.tags, ',')) AS tag_name
+        JOIN tags g ON g.name = lower(trim(tag_name))
+        WHERE g.organization_id = t.organization_id
+        ON CONFLICT DO NOTHING;
+
+        ALTER TABLE transactions DROP COLUMN tags;
+    END IF;
+END $$;
+
+-- Detected recurring series (subscriptions, rent, payroll)
+CREATE TABLE IF NOT EXISTS recurring_series (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    organization_id UUID REFERENCES organizations(id) NOT NULL,
+    merchant_key VARCHAR(255) NOT NULL,
+    merchant VARCHAR(255),
+    direction VARCHAR(10) NOT NULL,
+    cadence VARCHAR(20) NOT NULL,
+    typical_amount NUMERIC(10, 2) NOT NULL,
+    occurrence_count INTEGER NOT NULL DEFAULT 0,
+    first_date DATE NOT NULL,
+    last_date DATE NOT NULL,
+    next_expected_date DATE NOT NULL,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE
 );
+-- A merchant can bill several series (e.g. two plans), so this isn't unique
+ALTER TABLE recurring_series DROP CONSTRAINT IF EXISTS uq_recurring_series_org_merchant;
+
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS recurring_series_id UUID;
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS transfer_pair_id UUID REFERENCES transactions(id) ON DELETE SET NULL;
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+-- Normalized merchant (app.services.merchants.normalize_merchant), set by the API
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS merchant_key VARCHAR(255);
+UPDATE transactions
+SET merchant_key = NULLIF(btrim(regexp_replace(lower(merchant), '[^a-z]+', ' ', 'g')), '')
+WHERE merchant_key IS NULL AND merchant IS NOT NULL;
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'transactions_recurring_series_id_fkey'
+    ) THEN
+        ALTER TABLE transactions ADD CONSTRAINT transactions_recurring_series_id_fkey
+            FOREIGN KEY (recurring_series_id) REFERENCES recurring_series(id) ON DELETE SET NULL;
+    END IF;
+END $$;
+
+-- Rows imported from a statement outlive it (existing databases)
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conname = 'transactions_source_document_id_fkey' AND confdeltype <> 'n'
+    ) THEN
+        ALTER TABLE transactions DROP CONSTRAINT transactions_source_document_id_fkey;
+        ALTER TABLE transactions ADD CONSTRAINT transactions_source_document_id_fkey
+            FOREIGN KEY (source_document_id) REFERENCES documents(id) ON DELETE SET NULL;
+    END IF;
+END $$;
 
 -- Classification history
 CREATE TABLE IF NOT EXISTS classification_history (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    transaction_id UUID REFERENCES transactions(id),
+    transaction_id UUID REFERENCES transactions(id) ON DELETE SET NULL,
     suggested_category_id UUID REFERENCES categories(id),
     confidence_score NUMERIC(3, 2),
     rationale TEXT,
@@ -84,12 +189,98 @@ CREATE TABLE IF NOT EXISTS classification_history (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Deleting a transaction keeps its learning history (existing databases)
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conname = 'classification_history_transaction_id_fkey' AND confdeltype <> 'n'
+    ) THEN
+        ALTER TABLE classification_history DROP CONSTRAINT classification_history_transaction_id_fkey;
+        ALTER TABLE classification_history ADD CONSTRAINT classification_history_transaction_id_fkey
+            FOREIGN KEY (transaction_id) REFERENCES transactions(id) ON DELETE SET NULL;
+    END IF;
+END $$;
+
+-- Append-only field-level audit trail of transaction edits
+CREATE TABLE IF NOT EXISTS transaction_audit (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    organization_id UUID REFERENCES organizations(id) NOT NULL,
+    transaction_id UUID NOT NULL,
+    user_id UUID,
+    field VARCHAR(100) NOT NULL,
+    old_value TEXT,
+    new_value TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Closed fiscal periods moved out of transactions into Parquet files
+-- (min_date/max_date let reports skip files outside the requested range)
+CREATE TABLE IF NOT EXISTS transaction_archives (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    organization_id UUID REFERENCES organizations(id) NOT NULL,
+    period_start DATE NOT NULL,
+    period_end DATE NOT NULL,
+    min_date DATE NOT NULL,
+    max_date DATE NOT NULL,
+    row_count INTEGER NOT NULL,
+    total_amount NUMERIC(14, 2) NOT NULL,
+    storage_key VARCHAR(500) NOT NULL,
+    size_bytes BIGINT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Append-only change log feeding the dashboard change stream (SSE)
+CREATE TABLE IF NOT EXISTS change_events (
+    id BIGSERIAL PRIMARY KEY,
+    organization_id UUID REFERENCES organizations(id) NOT NULL,
+    entity VARCHAR(50) NOT NULL,
+    entity_id UUID NOT NULL,
+    action VARCHAR(50) NOT NULL,
+    status VARCHAR(50),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Per-organization change sequence: handed out under the organization row
+-- lock, so it is also commit order (BIGSERIAL ids are not). Existing events
+-- keep their id as seq so client cursors stay valid.
+ALTER TABLE organizations ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE change_events ADD COLUMN IF NOT EXISTS seq BIGINT;
+UPDATE change_events SET seq = id WHERE seq IS NULL;
+UPDATE organizations SET change_seq = latest.seq
+    FROM (SELECT organization_id, MAX(seq) AS seq FROM change_events GROUP BY organization_id) AS latest
+    WHERE organizations.id = latest.organization_id AND organizations.change_seq < latest.seq;
+ALTER TABLE change_events ALTER COLUMN seq SET NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_change_events_org_seq ON change_events(organization_id, seq);
+
 -- Create indexes for better query performance
 CREATE INDEX IF NOT EXISTS idx_transactions_org_id ON transactions(organization_id);
 CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date);
 CREATE INDEX IF NOT EXISTS idx_transactions_status ON transactions(status);
 CREATE INDEX IF NOT EXISTS idx_documents_org_id ON documents(organization_id);
+-- The reaper looks for documents whose processing stopped checkpointing
+CREATE INDEX IF NOT EXISTS idx_documents_status_checkpoint ON documents(status, checkpoint_at);
 CREATE INDEX IF NOT EXISTS idx_users_org_id ON users(organization_id);
+-- Transfer matching looks up unmatched rows by org, date window and amount
+CREATE INDEX IF NOT EXISTS idx_transactions_org_date_amount ON transactions(organization_id, date, amount)
+    WHERE is_transfer = FALSE AND transfer_pair_id IS NULL;
+CREATE INDEX IF NOT EXISTS idx_transactions_recurring_series_id ON transactions(recurring_series_id);
+-- Recurring detection looks up a merchant's history
+CREATE INDEX IF NOT EXISTS idx_transactions_org_merchant_key ON transactions(organization_id, merchant_key, date);
+CREATE INDEX IF NOT EXISTS idx_recurring_series_org_merchant ON recurring_series(organization_id, merchant_key, direction);
+CREATE INDEX IF NOT EXISTS idx_transaction_tags_tag_id ON transaction_tags(tag_id);
+CREATE INDEX IF NOT EXISTS idx_transaction_audit_transaction_id ON transaction_audit(transaction_id);
+CREATE INDEX IF NOT EXISTS idx_change_events_org_id_id ON change_events(organization_id, id);
+CREATE INDEX IF NOT EXISTS idx_transaction_archives_org_dates ON transaction_archives(organization_id, min_date, max_date);
+
+-- Full-text search over description/merchant/notes and fuzzy merchant matching
+-- (expression must match SEARCH_VECTOR_SQL in app/services/search.py)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_transactions_search ON transactions USING GIN (
+    to_tsvector('english', coalesce(transactions.description, '') || ' ' ||
+        coalesce(transactions.merchant, '') || ' ' || coalesce(transactions.notes, ''))
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_merchant_trgm ON transactions USING GIN (merchant gin_trgm_ops);
 
 -- Row Level Security (RLS) Policies
 -- Enable RLS on all tables
@@ -98,6 +289,12 @@ ALTER TABLE users ENABLE ROW LEVEL SECURITY;
 ALTER TABLE documents ENABLE ROW LEVEL SECURITY;
 ALTER TABLE transactions ENABLE ROW LEVEL SECURITY;
 ALTER TABLE categories ENABLE ROW LEVEL SECURITY;
+ALTER TABLE tags ENABLE ROW LEVEL SECURITY;
+ALTER TABLE transaction_tags ENABLE ROW LEVEL SECURITY;
+ALTER TABLE change_events ENABLE ROW LEVEL SECURITY;
+ALTER TABLE transaction_audit ENABLE ROW LEVEL SECURITY;
+ALTER TABLE recurring_series ENABLE ROW LEVEL SECURITY;
+ALTER TABLE transaction_archives ENABLE ROW LEVEL SECURITY;
 
 -- Policy: Users can only access their organization's data
 CREATE POLICY "Users can view own organization" ON organizations
@@ -124,6 +321,44 @@ CREATE POLICY "Users can view own transactions" ON transactions
         SELECT organization_id FROM users WHERE id = auth.uid()
     ));
 
+CREATE POLICY "Users can manage own tags" ON tags
+    FOR ALL
+    USING (organization_id IN (
+        SELECT organization_id FROM users WHERE id = auth.uid()
+    ));
+
+CREATE POLICY "Users can manage own transaction tags" ON transaction_tags
+    FOR ALL
+    USING (transaction_id IN (
+        SELECT id FROM transactions WHERE organization_id IN (
+            SELECT organization_id FROM users WHERE id = auth.uid()
+        )
+    ));
+
+CREATE POLICY "Users can view own change events" ON change_events
+    FOR SELECT
+    USING (organization_id IN (
+        SELECT organization_id FROM users WHERE id = auth.uid()
+    ));
+
+CREATE POLICY "Users can view own audit trail" ON transaction_audit
+    FOR SELECT
+    USING (organization_id IN (
+        SELECT organization_id FROM users WHERE id = auth.uid()
+    ));
+
+CREATE POLICY "Users can manage own recurring series" ON recurring_series
+    FOR ALL
+    USING (organization_id IN (
+        SELECT organization_id FROM users WHERE id = auth.uid()
+    ));
+
+CREATE POLICY "Users can view own transaction archives" ON transaction_archives
+    FOR SELECT
+    USING (organization_id IN (
+        SELECT organization_id FROM users WHERE id = auth.uid()
+    ));
+
 CREATE POLICY "Users can view categories" ON categories
     FOR SELECT
     USING (
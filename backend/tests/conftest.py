@@ -0,0 +1,103 @@
+"""
+Test configuration
+
+Tests run against a throwaway SQLite database. The models use the Postgres
+UUID type, which SQLite can't render, so it is compiled as CHAR(32) here;
+foreign keys are enforced on every connection like on Postgres.
+"""
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+_workdir = tempfile.mkdtemp(prefix="kern-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_workdir}/test.db")
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "test-secret")
+os.environ.setdefault("STORAGE_DIR", f"{_workdir}/storage")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("DEBUG", "false")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.dialects.postgresql import UUID  # noqa: E402
+from sqlalchemy.ext.compiler import compiles  # noqa: E402
+
+
+@compiles(UUID, "sqlite")
+def _compile_uuid_sqlite(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+from app.db.session import Base, SessionLocal, engine  # noqa: E402
+from app.models.models import Organization, User  # noqa: E402
+from app.services.search import create_search_index  # noqa: E402
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: timing comparisons; run with -m benchmark")
+
+
+def pytest_collection_modifyitems(config, items):
+    if "benchmark" in (config.getoption("-m") or ""):
+        return
+    skip = pytest.mark.skip(reason="benchmark; run with -m benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@event.listens_for(engine, "connect")
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    Base.metadata.create_all(bind=engine)
+    create_search_index(engine)
+    yield engine
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def org(db):
+    """
+    A fresh organization per test keeps tests independent; like on signup,
+    its owner user shares the organization's id
+    """
+    organization = Organization(id=uuid.uuid4(), name="Test Org")
+    db.add(organization)
+    db.flush()
+    db.add(User(id=organization.id, organization_id=organization.id, email=f"{organization.id}@example.com"))
+    db.commit()
+    return organization.id
+
+
+@pytest.fixture
+def client(org):
+    from fastapi.testclient import TestClient
+
+    from app.core.auth import get_current_user
+    from app.main import app
+
+    app.dependency_overrides[get_current_user] = lambda: {
+        "user_id": org,
+        "email": "owner@example.com",
+        "role": "authenticated",
+        "payload": {},
+    }
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
@@ -0,0 +1,65 @@
+"""
+Outlier scoring
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import update
+
+from app.models.models import ChangeEvent, Transaction, TransactionStatus
+from app.services.analytics import find_outliers, ledger_cache
+
+
+def _ledger(amounts, merchant="acme"):
+    return pd.DataFrame({
+        "id": range(len(amounts)),
+        "amount": [float(amount) for amount in amounts],
+        "merchant_key": merchant,
+        "category_id": None,
+        "is_transfer": False,
+    })
+
+
+def test_large_charge_in_small_group_is_flagged():
+    outliers = find_outliers(_ledger([-10] * 9 + [-5000]))
+
+    assert outliers["amount"].tolist() == [-5000.0]
+    assert outliers["group_mean"].iloc[0] == -10.0
+    assert outliers["z_score"].iloc[0] <= -3.0
+
+
+def test_scores_exclude_the_scored_row():
+    outliers = find_outliers(_ledger([-40, -50, -60, -45, -55, -150]), z_threshold=0.5)
+    scores = dict(zip(outliers["amount"], outliers["z_score"]))
+
+    # Peers of -150 are the five others: mean -50, sample std ~7.9
+    assert np.isclose(scores[-150.0], -100 / np.std([-40, -50, -60, -45, -55], ddof=1))
+    # The -150 row is a peer of every other row, so they aren't flagged at 3.0
+    assert list(find_outliers(_ledger([-40, -50, -60, -45, -55, -150]))["amount"]) == [-150.0]
+
+
+def test_normal_spread_and_small_groups_are_not_flagged():
+    rng = np.random.default_rng(7)
+    assert find_outliers(_ledger(rng.normal(-50, 5, 40).round(2))).empty
+    assert find_outliers(_ledger([-10, -10, -10, -5000])).empty
+    assert find_outliers(_ledger([-10] * 9 + [-10.5])).empty
+
+
+def test_flagging_records_changes_only_for_flagged_rows(client, db, org):
+    transactions = [
+        Transaction(organization_id=org, date=date(2024, 1, 1 + n % 28), amount=amount, merchant="Acme")
+        for n, amount in enumerate([-10.0] * 30 + [-5000.0, -4000.0])
+    ]
+    db.add_all(transactions)
+    db.commit()
+    big, reviewed = transactions[-2:]
+    ledger_cache.get(db, org)
+
+    # Reviewed behind the cached ledger's back, so it is still a candidate
+    db.execute(update(Transaction).where(Transaction.id == reviewed.id).values(status=TransactionStatus.REVIEWED))
+    db.commit()
+
+    assert client.post("/api/analytics/anomalies/flag").json() == {"flagged": 1}
+    changes = db.query(ChangeEvent).filter(ChangeEvent.organization_id == org).all()
+    assert [(change.entity_id, change.action) for change in changes] == [(big.id, "updated")]
@@ -0,0 +1,163 @@
+"""
+Archived periods and the storage they live in
+"""
+import os
+import uuid
+from datetime import date
+
+import pytest
+
+from app.models.models import Transaction, TransactionArchive
+from app.services import archive as archive_service
+from app.services.changes import get_changes_since
+from app.services.storage import ObjectStorage, StorageUnavailableError
+
+
+class FakeS3:
+    """The slice of the boto3 S3 client ObjectStorage uses"""
+
+    class MissingKey(Exception):
+        response = {"Error": {"Code": "404"}}
+
+    class ServerError(Exception):
+        response = {"Error": {"Code": "503"}}
+
+    class ConnectTimeout(Exception):
+        pass
+
+    def __init__(self):
+        self.objects = {}
+
+    def upload_file(self, filename, bucket, key):
+        with open(filename, "rb") as handle:
+            self.objects[bucket, key] = handle.read()
+
+    def download_file(self, bucket, key, filename):
+        if (bucket, key) not in self.objects:
+            raise self.MissingKey(key)
+        with open(filename, "wb") as handle:
+            handle.write(self.objects[bucket, key])
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+
+def _object_storage(tmp_path, name, s3):
+    store = ObjectStorage("kern", str(tmp_path / name))
+    store._client = s3
+    return store
+
+
+def test_object_storage_is_shared_between_instances(tmp_path):
+    s3 = FakeS3()
+    writer, reader = _object_storage(tmp_path, "a", s3), _object_storage(tmp_path, "b", s3)
+
+    writer.write_bytes("uploads/org/statement.csv", b"date,amount\n")
+
+    path = reader.path("uploads/org/statement.csv")
+    assert path.startswith(str(tmp_path / "b"))
+    with open(path, "rb") as handle:
+        assert handle.read() == b"date,amount\n"
+    assert reader.size("uploads/org/statement.csv") == 12
+
+    writer.delete("uploads/org/statement.csv")
+    assert not s3.objects
+    with pytest.raises(FileNotFoundError):
+        _object_storage(tmp_path, "c", s3).path("uploads/org/statement.csv")
+
+
+@pytest.fixture
+def archived(client, db, org):
+    db.add_all([
+        Transaction(organization_id=org, date=date(2020, 3, day), amount=amount)
+        for day, amount in ((2, -40.0), (9, 120.0), (16, -15.5))
+    ])
+    db.commit()
+    response = client.post("/api/archive/", json={"period_start": "2020-03-01", "period_end": "2020-03-31"})
+    assert response.status_code == 200
+    return db.get(TransactionArchive, uuid.UUID(response.json()["id"]))
+
+
+def test_reports_include_archived_rows(client, archived):
+    response = client.get("/api/reports/income-statement", params={"start_date": "2020-03-01", "end_date": "2020-03-31"})
+
+    assert response.status_code == 200
+    assert response.json()["net_income"] == pytest.approx(64.5)
+
+
+def test_missing_archive_file_is_503_not_500(client, archived):
+    os.remove(archive_service.storage.path(archived.storage_key))
+
+    response = client.get("/api/reports/income-statement", params={"start_date": "2020-03-01", "end_date": "2020-03-31"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
+
+
+@pytest.mark.parametrize("error", [FakeS3.ServerError, FakeS3.ConnectTimeout])
+def test_unreachable_object_storage_is_503_not_500(client, archived, monkeypatch, tmp_path, error):
+    s3 = FakeS3()
+
+    def download_file(bucket, key, filename):
+        raise error(key)
+
+    s3.download_file = download_file
+    store = _object_storage(tmp_path, "cache", s3)
+    with pytest.raises(StorageUnavailableError):
+        store.path(archived.storage_key)
+    monkeypatch.setattr(archive_service, "storage", store)
+
+    response = client.get("/api/reports/income-statement", params={"start_date": "2020-03-01", "end_date": "2020-03-31"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
+    assert client.delete(f"/api/archive/{archived.id}").status_code == 503
+
+
+def test_restore_with_mismatched_stats_is_409(client, db, archived):
+    archived.row_count += 1
+    db.commit()
+
+    response = client.delete(f"/api/archive/{archived.id}")
+
+    assert response.status_code == 409
+    assert db.get(TransactionArchive, archived.id) is not None
+
+
+def test_restore_succeeds_when_file_cleanup_fails(client, db, org, archived, monkeypatch):
+    archive_id = archived.id
+
+    def delete(key):
+        raise OSError("storage unreachable")
+
+    monkeypatch.setattr(archive_service.storage, "delete", delete)
+
+    response = client.delete(f"/api/archive/{archive_id}")
+
+    assert response.status_code == 200
+    db.expire_all()
+    assert db.get(TransactionArchive, archive_id) is None
+    assert db.query(Transaction).filter(Transaction.organization_id == org).count() == 3
+
+
+def test_archive_and_restore_are_streamed_per_transaction(client, db, org):
+    leg = Transaction(organization_id=org, date=date(2020, 3, 31), amount=-200.0, is_transfer=True)
+    hot = Transaction(organization_id=org, date=date(2020, 4, 1), amount=200.0, is_transfer=True)
+    other = Transaction(organization_id=org, date=date(2020, 3, 5), amount=-12.0)
+    db.add_all([leg, hot, other])
+    db.flush()
+    leg.transfer_pair_id, hot.transfer_pair_id = hot.id, leg.id
+    db.commit()
+    moved = {leg.id, other.id}
+
+    def transaction_changes(since):
+        return {(change.entity_id, change.action) for change in get_changes_since(db, org, since, 100)
+                if change.entity == "transaction"}
+
+    response = client.post("/api/archive/", json={"period_start": "2020-03-01", "period_end": "2020-03-31"})
+    assert response.status_code == 200
+    assert transaction_changes(0) == {(i, "deleted") for i in moved} | {(hot.id, "updated")}
+
+    since = max(change.seq for change in get_changes_since(db, org, 0, 100))
+    assert client.delete(f"/api/archive/{response.json()['id']}").status_code == 200
+    assert transaction_changes(since) == {(i, "inserted") for i in moved} | {(hot.id, "updated")}
@@ -0,0 +1,53 @@
+"""
+Review audit trail and classification history
+"""
+import uuid
+from datetime import date
+
+from app.models.models import Category, ClassificationHistory, Transaction, TransactionAudit
+from app.services.audit import AuditBuffer, audit_buffer
+
+
+def test_deleting_a_reviewed_transaction_keeps_its_history(client, db, org):
+    categories = [Category(id=uuid.uuid4(), organization_id=org, name=name) for name in ("Meals", "Travel")]
+    db.add_all(categories)
+    db.commit()
+    created = client.post("/api/transactions/", json={
+        "date": "2024-03-01", "amount": -42.0, "merchant": "Cafe", "category_id": str(categories[0].id)
+    }).json()
+
+    updated = client.put(f"/api/transactions/{created['id']}", json={"category_id": str(categories[1].id)})
+    assert updated.status_code == 200
+    audit_buffer.flush()
+
+    assert client.delete(f"/api/transactions/{created['id']}").status_code == 200
+    history = db.query(ClassificationHistory).filter(
+        ClassificationHistory.actual_category_id == categories[1].id
+    ).one()
+    assert history.transaction_id is None
+    assert history.was_accepted is False
+
+
+def test_failing_rows_do_not_take_the_batch_down(db, org):
+    transaction = Transaction(organization_id=org, date=date(2024, 1, 1), amount=-5.0)
+    db.add(transaction)
+    db.commit()
+
+    buffer = AuditBuffer(flush_size=100, flush_interval=60, max_retries=2)
+    buffer.add(TransactionAudit.__table__, [
+        {"organization_id": org, "transaction_id": transaction.id, "field": "notes", "new_value": str(i)}
+        for i in range(3)
+    ])
+    # References a transaction that doesn't exist (deleted before the flush)
+    buffer.add(ClassificationHistory.__table__, [
+        {"transaction_id": uuid.uuid4(), "was_accepted": True},
+        {"transaction_id": transaction.id, "was_accepted": True},
+    ])
+
+    assert buffer.flush() == 4
+    assert buffer.pending_count() == 1
+    assert buffer.flush() == 0
+    assert buffer.pending_count() == 0  # dropped after max_retries
+
+    assert db.query(TransactionAudit).filter(TransactionAudit.transaction_id == transaction.id).count() == 3
+    assert db.query(ClassificationHistory).filter(ClassificationHistory.transaction_id == transaction.id).count() == 1
@@ -0,0 +1,42 @@
+"""
+Change feed ordering
+"""
+import uuid
+
+from app.models.models import ChangeEvent, Organization
+from app.services.changes import get_changes_since, get_latest_change_id, record_change
+
+
+def test_sequence_is_per_organization_and_gapless(db, org):
+    other = Organization(id=uuid.uuid4(), name="Other")
+    db.add(other)
+    db.commit()
+
+    for _ in range(3):
+        record_change(db, org, "transaction", uuid.uuid4(), "inserted")
+    record_change(db, other.id, "transaction", uuid.uuid4(), "inserted")
+    db.commit()
+
+    # A rolled-back change doesn't use up a number
+    record_change(db, org, "transaction", uuid.uuid4(), "inserted")
+    db.flush()
+    db.rollback()
+    record_change(db, org, "transaction", uuid.uuid4(), "updated")
+    db.commit()
+
+    assert [change.seq for change in get_changes_since(db, org, 0, 100)] == [1, 2, 3, 4]
+    assert [change.action for change in get_changes_since(db, org, 3, 100)] == ["updated"]
+    assert [change.seq for change in get_changes_since(db, other.id, 0, 100)] == [1]
+    assert get_latest_change_id(db, org) == 4
+
+
+def test_changes_endpoint_pages_by_sequence(client, db, org):
+    for _ in range(5):
+        record_change(db, org, "document", uuid.uuid4(), "inserted", "pending")
+    db.commit()
+
+    first = client.get("/api/changes/", params={"since": 0, "limit": 2}).json()
+    assert [change["id"] for change in first["changes"]] == [1, 2]
+    rest = client.get("/api/changes/", params={"since": first["last_id"]}).json()
+    assert [change["id"] for change in rest["changes"]] == [3, 4, 5]
+    assert db.query(ChangeEvent).filter(ChangeEvent.organization_id == org).count() == 5
@@ -0,0 +1,105 @@
+"""
+Statement upload, processing and deletion
+"""
+import uuid
+
+import pytest
+
+from app.models.models import Document, Transaction
+from app.services.changes import get_changes_since
+from app.services.ingest import XLS, XLSX, detect_content_type
+from app.services.storage import storage
+
+
+def _upload(client, content: bytes, content_type="text/csv", filename="statement.csv"):
+    response = client.post("/api/documents/upload", files={"file": (filename, content, content_type)})
+    assert response.status_code == 201
+    document_id = response.json()["id"]
+    assert client.post(f"/api/documents/{document_id}/process").status_code == 200
+    return uuid.UUID(document_id)
+
+
+def _changes(db, org, entity="transaction"):
+    return [
+        (change.entity_id, change.action)
+        for change in get_changes_since(db, org, 0, 10000)
+        if change.entity == entity
+    ]
+
+
+def _rows(db, document_id):
+    return db.query(Transaction).filter(Transaction.source_document_id == document_id).all()
+
+
+@pytest.mark.parametrize("head, content_type", [
+    (b"%PDF-1.7\n", "application/pdf"),
+    (b"PK\x03\x04\x14\x00", XLSX),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", XLS),
+    (b"Date,Amount\n", "text/csv"),
+    (b"", "text/csv"),
+])
+def test_content_type_is_sniffed(tmp_path, head, content_type):
+    path = tmp_path / "upload"
+    path.write_bytes(head)
+    assert detect_content_type(str(path)) == content_type
+
+
+def test_csv_sent_as_excel_is_imported_and_streamed(client, db, org):
+    document_id = _upload(
+        client,
+        b"Date,Description,Amount\n2024-05-01,Coffee,-4.50\n2024-05-02,Refund,12.00\nnot a row,,\n",
+        content_type="application/vnd.ms-excel",
+    )
+
+    document = db.get(Document, document_id)
+    assert document.status.value == "completed"
+    assert (document.rows_imported, document.rows_skipped) == (2, 1)
+    rows = _rows(db, document_id)
+    assert sorted((row.id, "inserted") for row in rows) == sorted(_changes(db, org))
+
+
+def test_paired_history_leg_is_streamed_as_updated(client, db, org):
+    first = _upload(client, b"Date,Amount\n2024-05-02,-250.00\n")
+    (outflow,) = _rows(db, first)
+
+    second = _upload(client, b"Date,Amount\n2024-05-03,250.00\n", filename="savings.csv")
+    (inflow,) = _rows(db, second)
+
+    db.refresh(outflow)
+    assert outflow.transfer_pair_id == inflow.id
+    assert (outflow.id, "updated") in _changes(db, org)
+
+
+def test_deleting_a_document_keeps_its_rows(client, db, org):
+    kept = _upload(client, b"Date,Amount\n2024-06-01,-75.00\n")
+    deleted = _upload(client, b"Date,Amount\n2024-06-02,75.00\n2024-06-03,-9.99\n", filename="other.csv")
+    unlinked = {row.id: row.version for row in _rows(db, deleted)}
+    (kept_row,) = _rows(db, kept)
+    assert kept_row.transfer_pair_id in unlinked
+
+    assert client.delete(f"/api/documents/{deleted}").status_code == 200
+
+    db.expire_all()
+    assert db.get(Document, deleted) is None
+    for transaction_id, version in unlinked.items():
+        row = db.get(Transaction, transaction_id)
+        assert row.source_document_id is None and row.version == version + 1
+    assert {(transaction_id, "updated") for transaction_id in unlinked} <= set(_changes(db, org))
+
+    # The transfer that spans both statements stays paired
+    assert db.get(Transaction, kept_row.transfer_pair_id).is_transfer
+    report = client.get("/api/reports/income-statement", params={"start_date": "2024-06-01", "end_date": "2024-06-30"})
+    assert report.json()["expenses"]["total"] == pytest.approx(9.99)
+
+
+def test_delete_succeeds_when_file_cleanup_fails(client, db, org, monkeypatch):
+    document_id = _upload(client, b"Date,Amount\n2024-06-01,-75.00\n")
+
+    def delete(key):
+        raise OSError("storage unreachable")
+
+    monkeypatch.setattr(storage, "delete", delete)
+
+    assert client.delete(f"/api/documents/{document_id}").status_code == 200
+    db.expire_all()
+    assert db.get(Document, document_id) is None
@@ -0,0 +1,89 @@
+"""
+Admission control
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import ratelimit
+from app.core.config import settings
+from app.core.ratelimit import POLICIES, RateLimitBackend, admission_control
+
+
+class RecordingBackend(RateLimitBackend):
+    """Allows or denies every take() and records the keys"""
+
+    def __init__(self, retry_after: float = 0.0):
+        self.retry_after = retry_after
+        self.keys = []
+
+    def take(self, key, rate_per_second, capacity, cost=1.0):
+        self.keys.append(key)
+        return self.retry_after
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_TIMEOUT_SECONDS", 0.01)
+    monkeypatch.setattr(ratelimit, "concurrency_limiter", ratelimit.ConcurrencyLimiter())
+
+    def use(backend):
+        monkeypatch.setattr(ratelimit, "rate_limit_backend", backend)
+        return backend
+    return use
+
+
+def test_backend_must_implement_take():
+    with pytest.raises(TypeError):
+        RateLimitBackend()
+
+
+def test_token_is_only_taken_once_a_slot_is_held(limits):
+    backend = limits(RecordingBackend())
+    key = "reports:org"
+
+    async def admit():
+        dependency = admission_control("reports")(user={"user_id": "org"})
+        await dependency.__anext__()
+        return dependency
+
+    async def scenario():
+        held = [await admit() for _ in range(POLICIES["reports"].max_concurrent)]
+        assert len(backend.keys) == len(held)
+
+        with pytest.raises(HTTPException) as rejected:
+            await admit()
+        assert rejected.value.status_code == 429
+        assert len(backend.keys) == len(held)
+
+        # A slot freed by a finished request is usable again
+        await held[0].aclose()
+        await admit()
+        assert len(backend.keys) == len(held) + 1
+
+    asyncio.run(scenario())
+    assert set(backend.keys) == {key}
+
+
+def test_rate_limited_request_releases_its_slot(limits):
+    limits(RecordingBackend(retry_after=5))
+
+    async def scenario():
+        for _ in range(POLICIES["reports"].max_concurrent + 1):
+            with pytest.raises(HTTPException) as rejected:
+                await admission_control("reports")(user={"user_id": "org"}).__anext__()
+            assert rejected.value.headers["Retry-After"] == "5"
+
+    asyncio.run(scenario())
+
+
+def test_only_expensive_reports_are_limited(limits, client):
+    limits(RecordingBackend(retry_after=30))
+
+    assert client.get("/api/reports/balance-sheet", params={"as_of_date": "2024-01-31"}).status_code == 200
+    assert client.get("/api/reports/cash-flow", params={"start_date": "2024-01-01", "end_date": "2024-01-31"}).status_code == 200
+    limited = client.get("/api/reports/income-statement", params={"start_date": "2024-01-01", "end_date": "2024-01-31"})
+    assert limited.status_code == 429
+    assert limited.headers["Retry-After"] == "30"
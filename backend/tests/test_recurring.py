@@ -0,0 +1,80 @@
+"""
+Recurring series detection
+"""
+import uuid
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+
+from app.models.models import RecurringSeries, Transaction
+from app.services.recurring import rebuild_recurring_series, update_recurring_series
+
+
+def _monthly(org, merchant, amount, months, start=date(2024, 1, 5)):
+    return [
+        Transaction(organization_id=org, date=start + relativedelta(months=month), amount=amount, merchant=merchant)
+        for month in range(months)
+    ]
+
+
+def _series(db, org):
+    return sorted(
+        (series.merchant_key, series.cadence, series.typical_amount, series.occurrence_count)
+        for series in db.query(RecurringSeries).filter(RecurringSeries.organization_id == org)
+    )
+
+
+def test_merchant_key_is_stored_on_insert_and_update(client, db, org):
+    created = client.post("/api/transactions/", json={"date": "2024-03-01", "amount": -9.99, "merchant": "NETFLIX.COM 866"})
+    transaction_id = uuid.UUID(created.json()["id"])
+    assert db.get(Transaction, transaction_id).merchant_key == "netflix com"
+
+    client.put(f"/api/transactions/{transaction_id}", json={"merchant": "Spotify AB"})
+    db.expire_all()
+    assert db.get(Transaction, transaction_id).merchant_key == "spotify ab"
+
+
+def test_rebuild_detects_two_series_at_one_merchant(db, org):
+    db.add_all(_monthly(org, "Acme Cloud", -9.99, 4) + _monthly(org, "ACME CLOUD #2", -49.0, 4, start=date(2024, 1, 20)))
+    db.flush()
+
+    rebuild_recurring_series(db, org)
+
+    assert _series(db, org) == [("acme cloud", "monthly", -49.0, 4), ("acme cloud", "monthly", -9.99, 4)]
+
+
+def test_second_series_at_merchant_is_detected_incrementally(db, org):
+    first = _monthly(org, "Acme Cloud", -9.99, 4)
+    db.add_all(first)
+    db.flush()
+    update_recurring_series(db, org, first)
+    assert _series(db, org) == [("acme cloud", "monthly", -9.99, 4)]
+
+    # Rows that don't fit the existing series are checked against history
+    second = _monthly(org, "Acme Cloud", -49.0, 3, start=date(2024, 1, 20))
+    for transaction in second:
+        db.add(transaction)
+        db.flush()
+        update_recurring_series(db, org, [transaction])
+    db.commit()
+
+    assert _series(db, org) == [("acme cloud", "monthly", -49.0, 3), ("acme cloud", "monthly", -9.99, 4)]
+    assert all(transaction.recurring_series_id for transaction in second)
+
+
+def test_older_statement_imported_later_joins_the_series(db, org):
+    recent = _monthly(org, "Netflix", -15.99, 6)
+    db.add_all(recent)
+    db.flush()
+    update_recurring_series(db, org, recent)
+
+    older = _monthly(org, "NETFLIX", -15.99, 12, start=date(2023, 1, 5))
+    db.add_all(older)
+    db.flush()
+    update_recurring_series(db, org, older)
+    db.commit()
+
+    assert _series(db, org) == [("netflix", "monthly", -15.99, 18)]
+    series = db.query(RecurringSeries).filter(RecurringSeries.organization_id == org).one()
+    assert (series.first_date, series.last_date) == (date(2023, 1, 5), date(2024, 6, 5))
+    assert {transaction.recurring_series_id for transaction in recent + older} == {series.id}
@@ -0,0 +1,80 @@
+"""
+Read routing between the primary and a replica
+
+The replica is a second SQLite database that "replicates" only when a test
+copies rows into it, so which instance served a read is observable.
+"""
+import pytest
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.orm import sessionmaker
+
+from app.db import session as db_session
+from app.db.session import Base, CHANGE_SEQ_HEADER, READ_AFTER_COOKIE, READ_AFTER_HEADER, ReplicaRouter
+from app.models.models import Organization, Transaction
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch, db, org):
+    engine = create_engine(f"sqlite:///{tmp_path}/replica.db")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Organization).values(id=org, name="Test Org", change_seq=0))
+    monkeypatch.setattr(db_session, "replica_router", ReplicaRouter(engine))
+    monkeypatch.setattr(db_session, "ReadSessionLocal", sessionmaker(bind=engine))
+    yield engine
+    engine.dispose()
+
+
+def _replicate(db, replica, org):
+    """Bring the replica up to date with the primary for an organization"""
+    change_seq = db.scalar(select(Organization.change_seq).where(Organization.id == org))
+    rows = db.execute(select(Transaction.__table__).where(Transaction.organization_id == org)).mappings().all()
+    with replica.begin() as conn:
+        conn.execute(update(Organization).where(Organization.id == org).values(change_seq=change_seq))
+        conn.execute(insert(Transaction), [dict(row) for row in rows])
+
+
+def _merchants(response):
+    assert response.status_code == 200
+    return [row["merchant"] for row in response.json()]
+
+
+def test_router_waits_for_replica_to_replay_the_marker(replica, org):
+    router = ReplicaRouter(replica)
+
+    assert router.use_replica(org)
+    assert router.use_replica(org, read_after=0)
+    assert not router.use_replica(org, read_after=3)
+
+    with replica.begin() as conn:
+        conn.execute(update(Organization).where(Organization.id == org).values(change_seq=3))
+    assert router.use_replica(org, read_after=3)
+
+
+def test_router_uses_primary_without_replica():
+    assert not ReplicaRouter(None).use_replica("org", read_after=1)
+
+
+def test_client_reads_its_writes_until_replica_catches_up(client, db, replica, org):
+    created = client.post("/api/transactions/", json={"date": "2024-03-01", "amount": -12.5, "merchant": "Cafe"})
+    assert created.status_code == 201
+    change_seq = created.headers[CHANGE_SEQ_HEADER]
+    assert client.cookies[READ_AFTER_COOKIE] == f"{org}:{change_seq}"
+
+    # The writer reads from the primary; a client without the marker from the replica
+    assert _merchants(client.get("/api/transactions/")) == ["Cafe"]
+    client.cookies.clear()
+    assert _merchants(client.get("/api/transactions/")) == []
+    assert _merchants(client.get("/api/transactions/", headers={READ_AFTER_HEADER: change_seq})) == ["Cafe"]
+
+    _replicate(db, replica, org)
+    with replica.begin() as conn:
+        conn.execute(update(Transaction).values(merchant="Cafe (replica)"))
+    assert _merchants(client.get("/api/transactions/", headers={READ_AFTER_HEADER: change_seq})) == ["Cafe (replica)"]
+
+
+def test_reads_do_not_set_marker(client, replica):
+    response = client.get("/api/transactions/")
+    assert response.status_code == 200
+    assert CHANGE_SEQ_HEADER not in response.headers
+    assert READ_AFTER_COOKIE not in client.cookies
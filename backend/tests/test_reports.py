@@ -0,0 +1,93 @@
+"""
+Comparative income statement
+
+The benchmark reproduces the comparison of one /comparative call against the
+12 monthly /income-statement calls it replaces:
+
+    BENCHMARK_ROWS=200000 python -m pytest -m benchmark -s tests/test_reports.py
+"""
+import os
+import random
+import time
+from datetime import date
+
+import pytest
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import insert
+
+from app.models.models import Transaction
+
+MONTHS = [date(2024, 1, 1) + relativedelta(months=month) for month in range(12)]
+
+
+def _seed(db, org, rows: int, seed: int = 34):
+    """rows transactions spread over 2023-2024, about 1% of them transfers"""
+    generator = random.Random(seed)
+    start, days = date(2023, 1, 1), (date(2024, 12, 31) - date(2023, 1, 1)).days
+    batch = []
+    for _ in range(rows):
+        batch.append({
+            "organization_id": org,
+            "date": start + relativedelta(days=generator.randrange(days + 1)),
+            "amount": round(generator.uniform(-500, 400), 2) or 1.0,
+            "merchant": f"Merchant {generator.randrange(200)}",
+            "is_transfer": generator.random() < 0.01,
+        })
+        if len(batch) == 10000:
+            db.execute(insert(Transaction), batch)
+            batch = []
+    if batch:
+        db.execute(insert(Transaction), batch)
+    db.commit()
+
+
+def _monthly_net_income(client):
+    """Net income per month of 2024 from 12 income-statement calls"""
+    net = []
+    for month in MONTHS:
+        response = client.get("/api/reports/income-statement", params={
+            "start_date": month.isoformat(),
+            "end_date": (month + relativedelta(months=1, days=-1)).isoformat(),
+        })
+        assert response.status_code == 200
+        net.append(response.json()["net_income"])
+    return net
+
+
+def _comparative(client):
+    response = client.get("/api/reports/comparative", params={
+        "start_date": "2024-01-01", "end_date": "2024-12-31", "compare_prior_year": True,
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_comparative_matches_monthly_income_statements(client, db, org):
+    _seed(db, org, 600)
+
+    report = _comparative(client)
+
+    assert report["periods"] == [month.strftime("%Y-%m") for month in MONTHS]
+    assert report["net_income"] == pytest.approx(_monthly_net_income(client))
+    assert len(report["prior_year"]["net_income"]) == 12
+
+
+@pytest.mark.benchmark
+def test_benchmark_comparative_against_monthly_calls(client, db, org):
+    rows = int(os.environ.get("BENCHMARK_ROWS", "200000"))
+    _seed(db, org, rows)
+
+    started = time.perf_counter()
+    report = _comparative(client)
+    comparative_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    net_income = _monthly_net_income(client)
+    monthly_seconds = time.perf_counter() - started
+
+    print(
+        f"\n{rows} rows: 1 comparative call (2024 + prior year) {comparative_seconds:.2f}s, "
+        f"12 income-statement calls (2024) {monthly_seconds:.2f}s"
+    )
+    assert report["net_income"] == pytest.approx(net_income)
+    assert comparative_seconds < monthly_seconds
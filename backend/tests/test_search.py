@@ -0,0 +1,107 @@
+"""
+Transaction search (SQLite FTS5 path)
+"""
+import base64
+import json
+import uuid
+from datetime import date
+
+import pytest
+
+from app.models.models import Transaction, TransactionStatus
+from app.services.search import InvalidCursor, search_transactions
+
+
+def add_transactions(db, org, rows):
+    transactions = [Transaction(organization_id=org, **row) for row in rows]
+    db.add_all(transactions)
+    db.commit()
+    return transactions
+
+
+def test_matches_description_merchant_and_notes(db, org):
+    add_transactions(db, org, [
+        {"date": date(2024, 1, 1), "amount": -15.99, "merchant": "Netflix", "description": "Subscription"},
+        {"date": date(2024, 1, 2), "amount": -40.0, "description": "Office supplies", "notes": "printer paper"},
+        {"date": date(2024, 1, 3), "amount": -9.0, "merchant": "Spotify"},
+    ])
+
+    assert [t.merchant for t, _ in search_transactions(db, org, "netflix")[0]] == ["Netflix"]
+    assert [t.description for t, _ in search_transactions(db, org, "paper")[0]] == ["Office supplies"]
+    # Prefix match
+    assert [t.merchant for t, _ in search_transactions(db, org, "spot")[0]] == ["Spotify"]
+    assert search_transactions(db, org, "nothing-like-this")[0] == []
+
+
+def test_results_are_scoped_to_organization(db, org):
+    add_transactions(db, org, [{"date": date(2024, 1, 1), "amount": -1.0, "merchant": "Acme"}])
+    assert search_transactions(db, uuid.uuid4(), "acme")[0] == []
+
+
+def test_filters(db, org):
+    add_transactions(db, org, [
+        {"date": date(2024, 1, 5), "amount": -20.0, "merchant": "Uber", "status": TransactionStatus.PENDING},
+        {"date": date(2024, 2, 5), "amount": -60.0, "merchant": "Uber", "status": TransactionStatus.REVIEWED},
+        {"date": date(2024, 3, 5), "amount": -5.0, "merchant": "Uber", "status": TransactionStatus.PENDING},
+    ])
+
+    def amounts(**filters):
+        return sorted(t.amount for t, _ in search_transactions(db, org, "uber", **filters)[0])
+
+    assert amounts() == [-60.0, -20.0, -5.0]
+    assert amounts(status=TransactionStatus.PENDING) == [-20.0, -5.0]
+    assert amounts(start_date=date(2024, 2, 1), end_date=date(2024, 2, 28)) == [-60.0]
+    assert amounts(min_amount=-30.0, max_amount=-10.0) == [-20.0]
+
+
+@pytest.mark.parametrize("sort", ["relevance", "date"])
+def test_cursor_pages_through_ties_without_gaps(db, org, sort):
+    # Identical rows rank equally, so paging relies on the id tie-breaker
+    add_transactions(db, org, [
+        {"date": date(2024, 1, 1 + i % 3), "amount": -15.99, "merchant": "Netflix", "description": "Netflix monthly"}
+        for i in range(11)
+    ])
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        results, cursor = search_transactions(db, org, "netflix monthly", sort=sort, limit=4, cursor=cursor)
+        seen.extend(t.id for t, _ in results)
+        pages += 1
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert len(seen) == len(set(seen)) == 11
+
+
+def test_invalid_cursor(db, org):
+    with pytest.raises(InvalidCursor):
+        search_transactions(db, org, "anything", cursor="not-a-cursor")
+
+
+@pytest.mark.parametrize("sort_value", [20240101, None, ["2024-01-01"], "yesterday"])
+def test_date_cursor_with_malformed_sort_value(client, db, org, sort_value):
+    payload = json.dumps([1.0, sort_value, str(uuid.uuid4())])
+    cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+
+    with pytest.raises(InvalidCursor):
+        search_transactions(db, org, "anything", sort="date", cursor=cursor)
+    response = client.get("/api/transactions/search", params={"q": "x", "sort": "date", "cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_search_endpoint(client, db, org):
+    add_transactions(db, org, [
+        {"date": date(2024, 1, 1), "amount": -15.99, "merchant": "Netflix"},
+        {"date": date(2024, 1, 2), "amount": -15.99, "merchant": "Netflix"},
+    ])
+
+    first = client.get("/api/transactions/search", params={"q": "netflix", "limit": 1}).json()
+    assert len(first["results"]) == 1 and first["next_cursor"]
+    second = client.get(
+        "/api/transactions/search", params={"q": "netflix", "limit": 1, "cursor": first["next_cursor"]}
+    ).json()
+    assert second["results"][0]["id"] != first["results"][0]["id"]
+    assert second["next_cursor"] is None
+
+    assert client.get("/api/transactions/search", params={"q": "x", "cursor": "bad"}).status_code == 400
@@ -0,0 +1,20 @@
+"""
+API process startup
+"""
+import os
+
+from app.core.startup import import_time_profile
+from app.services.loaders import HEAVY_MODULES
+
+# Measured ~0.6s here; headroom for slower CI machines
+IMPORT_TIME_BUDGET_SECONDS = float(os.environ.get("IMPORT_TIME_BUDGET_SECONDS", "1.5"))
+
+
+def test_import_app_main_is_within_budget(monkeypatch):
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    wall, modules = import_time_profile("app.main")
+
+    assert wall < IMPORT_TIME_BUDGET_SECONDS, f"import app.main took {wall:.3f}s"
+    imported = {name for name, _, _ in modules}
+    assert not imported & set(HEAVY_MODULES), "heavy modules must be imported on first use"
@@ -0,0 +1,29 @@
+"""
+Tag normalization and creation
+"""
+from app.db.session import SessionLocal
+from app.models.models import Tag
+from app.services.tags import get_or_create_tags, normalize_tag_names
+
+
+def test_normalize_tag_names():
+    assert normalize_tag_names(" Travel, office,travel ,") == ["travel", "office"]
+    assert normalize_tag_names(["A", "a", " b "]) == ["a", "b"]
+    assert normalize_tag_names(None) == []
+
+
+def test_get_or_create_tags_tolerates_concurrent_creation(db, org):
+    # Another request commits the same new tag after this session started
+    db.query(Tag).filter(Tag.organization_id == org).all()
+    other = SessionLocal()
+    try:
+        get_or_create_tags(other, org, ["travel"])
+        other.commit()
+    finally:
+        other.close()
+
+    tags = get_or_create_tags(db, org, ["Travel", "meals"])
+    db.commit()
+
+    assert [tag.name for tag in tags] == ["travel", "meals"]
+    assert db.query(Tag).filter(Tag.organization_id == org).count() == 2
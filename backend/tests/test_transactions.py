@@ -0,0 +1,61 @@
+"""
+Transaction edits
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.db.session import engine
+
+
+@contextmanager
+def statements():
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield executed
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def _create(client, **values):
+    response = client.post("/api/transactions/", json={"date": "2024-04-02", "amount": -30.0, **values})
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_update_returns_tags_without_loading_them(client):
+    created = _create(client, merchant="Cafe", tags=["Food", "team"])
+
+    with statements() as executed:
+        response = client.put(f"/api/transactions/{created['id']}", json={"notes": "lunch"})
+
+    assert response.status_code == 200
+    assert response.json()["tags"] == ["food", "team"]
+    assert response.json()["version"] == created["version"] + 1
+    assert response.headers["ETag"] == f'"{created["version"] + 1}"'
+    # Names come with the edit's own statement, not a lazy load of Transaction.tags
+    assert not [sql for sql in executed if sql.lstrip().startswith("SELECT tags.")]
+
+
+def test_update_replacing_tags_returns_new_tags(client):
+    created = _create(client, tags=["food"])
+
+    response = client.put(f"/api/transactions/{created['id']}", json={"tags": ["Travel"]})
+
+    assert response.status_code == 200
+    assert response.json()["tags"] == ["travel"]
+
+
+def test_update_without_tags_on_untagged_transaction(client):
+    created = _create(client)
+
+    response = client.put(f"/api/transactions/{created['id']}", json={"amount": -31.0})
+
+    assert response.status_code == 200
+    assert response.json()["tags"] == []
+    assert response.json()["amount"] == -31.0
@@ -0,0 +1,92 @@
+"""
+Transfer matching
+"""
+from datetime import date
+
+import pytest
+
+from app.models.models import ChangeEvent, Document, Transaction
+from app.services.transfers import match_transfers
+
+
+@pytest.fixture
+def statements(db, org):
+    documents = [Document(organization_id=org, filename=f"statement-{n}.csv") for n in range(2)]
+    db.add_all(documents)
+    db.flush()
+    return [document.id for document in documents]
+
+
+def _transaction(org, amount, document_id=None, day=date(2024, 5, 2)):
+    return Transaction(organization_id=org, date=day, amount=amount, source_document_id=document_id)
+
+
+def test_offsetting_rows_from_two_statements_are_paired(db, org, statements):
+    outflow = _transaction(org, -250.0, statements[0])
+    db.add(outflow)
+    db.flush()
+
+    inflow = _transaction(org, 250.0, statements[1], day=date(2024, 5, 4))
+    db.add(inflow)
+    assert match_transfers(db, org, [inflow]) == 1
+    db.commit()
+    db.refresh(outflow)
+
+    assert inflow.is_transfer and outflow.is_transfer
+    assert inflow.transfer_pair_id == outflow.id and outflow.transfer_pair_id == inflow.id
+
+
+@pytest.mark.parametrize("documents", [(None, None), (0, None), (None, 0), (0, 0)])
+def test_manual_entries_and_same_statement_are_not_paired(db, org, statements, documents):
+    first, second = (None if n is None else statements[n] for n in documents)
+    history = _transaction(org, -80.0, first)
+    db.add(history)
+    db.flush()
+
+    new = [_transaction(org, 80.0, second), _transaction(org, -80.0, second)]
+    db.add_all(new)
+    assert match_transfers(db, org, new) == 0
+    db.commit()
+    db.refresh(history)
+
+    assert not history.is_transfer
+    assert not any(transaction.is_transfer for transaction in new)
+
+
+def test_only_offsetting_amounts_in_window_are_candidates(db, org, statements):
+    db.add_all([
+        _transaction(org, -99.5, statements[0]),
+        _transaction(org, -99.5, statements[0], day=date(2024, 5, 20)),
+    ])
+    db.flush()
+
+    inflow = _transaction(org, 99.5, statements[1], day=date(2024, 5, 1))
+    db.add(inflow)
+    assert match_transfers(db, org, [inflow]) == 1
+    db.commit()
+
+    paired = db.get(Transaction, inflow.transfer_pair_id)
+    assert paired.date == date(2024, 5, 2)
+
+
+def test_deleting_one_leg_unflags_the_other(client, db, org, statements):
+    outflow = _transaction(org, -75.0, statements[0])
+    inflow = _transaction(org, 75.0, statements[1])
+    db.add(outflow)
+    db.flush()
+    db.add(inflow)
+    match_transfers(db, org, [inflow])
+    db.commit()
+    version, inflow_id = outflow.version, inflow.id
+
+    assert client.delete(f"/api/transactions/{inflow_id}").status_code == 200
+    db.expire_all()
+
+    assert not outflow.is_transfer and outflow.transfer_pair_id is None
+    assert outflow.version == version + 1
+    changes = db.query(ChangeEvent).filter(ChangeEvent.organization_id == org).order_by(ChangeEvent.seq).all()
+    assert [(change.entity_id, change.action) for change in changes[-2:]] == [
+        (outflow.id, "updated"), (inflow_id, "deleted")
+    ]
+    report = client.get("/api/reports/income-statement", params={"start_date": "2024-05-01", "end_date": "2024-05-31"})
+    assert report.json()["expenses"]["total"] == pytest.approx(75.0)